@@ -0,0 +1,93 @@
+# ==========================================
+# batching.py
+# Coalesce concurrent requests into one batched call
+# ==========================================
+#
+# Requests `submit()` an item and await its result. A single worker task
+# collects items for up to `max_wait_ms` (or until `max_batch_size` are
+# queued), runs `process_batch(items)` once in the threadpool and hands
+# each caller its own entry of the returned list.
+#
+# on_batch(size, queue_wait_seconds), if given, is called for every batch
+# (wait = how long its oldest item sat in the queue) for metrics.
+
+import asyncio
+
+from starlette.concurrency import run_in_threadpool
+
+
+class MicroBatcher:
+
+    def __init__(self, process_batch, max_batch_size=32, max_wait_ms=5.0, on_batch=None):
+        self.process_batch = process_batch
+        self.on_batch = on_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.loop = None
+        self.queue = None
+        self.worker = None
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self):
+        # Queue and worker belong to the loop that serves requests; rebuild
+        # them if that loop changes (e.g. a fresh loop per test client)
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop or self.worker is None or self.worker.done():
+            self.loop = loop
+            self.queue = asyncio.Queue()
+            self.worker = loop.create_task(self._run())
+
+    async def submit(self, item):
+        self._ensure_worker()
+        future = self.loop.create_future()
+        await self.queue.put((item, future, self.loop.time()))
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        deadline = self.loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - self.loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            items = [item for item, _, _ in batch]
+            if self.on_batch is not None:
+                self.on_batch(len(items), self.loop.time() - batch[0][2])
+
+            try:
+                results = await run_in_threadpool(self.process_batch, items)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(items)
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():   # caller may have disconnected
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0
+        }
@@ -0,0 +1,554 @@
+# ==========================================
+# benchmark.py
+# Latency / throughput benchmark for server.py and roadmap_server.py
+# ==========================================
+#
+# Drives the services with concurrent clients and reports requests/second
+# and p50 / p95 / p99 latency per stage:
+#
+#   in-process : encoder, search and analysis stages called directly, and
+#                every endpoint through the ASGI / WSGI test clients
+#   http       : endpoints over real sockets against uvicorn / flask
+#                subprocesses (--http)
+#
+# --synthetic generates mapping, embeddings, risk features, model, scaler
+# and a roadmap tree in a temporary directory and swaps MiniLM for the
+# deterministic "hash" encoder (encoders.py), so it runs offline and gives
+# the same workload on every machine. Without it the real artifacts and
+# ENCODER_BACKEND are used, and roadmaps need ROADMAP_REPO_PATH.
+#
+# Gate a deploy on the numbers (exit code 1 when a limit is exceeded):
+#   python benchmark.py --synthetic --http --max-p95 "POST /analyze=50"
+#
+# Usage:
+#   python benchmark.py --synthetic
+#   python benchmark.py --synthetic --http --clients 16 --requests 2000
+#   python benchmark.py --target ai --json results.json
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent
+ROADMAP_DIR = BASE_DIR.parent / "integration_ready"
+
+DEFAULT_REQUESTS = 500
+DEFAULT_CLIENTS = 8
+WARMUP_REQUESTS = 20
+ANALYZE_BATCH_SIZE = 32
+READY_TIMEOUT_S = 300
+
+
+# ==========================================
+# LOAD RUNNER
+# ==========================================
+
+def summarize(stage, mode, latencies, wall_seconds, errors, clients):
+    latencies_ms = 1000 * np.asarray(latencies, dtype=np.float64)
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]) if len(latencies_ms) else (0, 0, 0)
+    return {
+        "mode": mode,
+        "stage": stage,
+        "requests": len(latencies),
+        "clients": clients,
+        "errors": errors,
+        "rps": len(latencies) / wall_seconds if wall_seconds else 0.0,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "mean_ms": float(latencies_ms.mean()) if len(latencies_ms) else 0.0,
+    }
+
+
+def run_load(call, payloads, clients):
+    """
+    Send every payload once, shared by `clients` threads pulling from one
+    queue. call(payload) returns an HTTP status (anything else counts as
+    success for direct calls).
+    Returns (latencies, wall_seconds, errors).
+    """
+    latencies = [0.0] * len(payloads)
+    next_item = itertools.count()
+    errors = []
+
+    def worker():
+        while True:
+            i = next(next_item)
+            if i >= len(payloads):
+                return
+            start = time.perf_counter()
+            try:
+                status = call(payloads[i])
+                failed = isinstance(status, int) and status >= 400
+            except Exception:
+                failed = True
+            latencies[i] = time.perf_counter() - start
+            if failed:
+                errors.append(i)
+
+    threads = [threading.Thread(target=worker) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - start, len(errors)
+
+
+def bench_stage(results, mode, stage, call, payloads, clients, warmup=WARMUP_REQUESTS):
+    run_load(call, payloads[:warmup], clients)
+    latencies, wall, errors = run_load(call, payloads, clients)
+    result = summarize(stage, mode, latencies, wall, errors, clients)
+    results.append(result)
+    print_result(result)
+    return result
+
+
+def print_header():
+    print(
+        f"{'mode':<11} {'stage':<28} {'reqs':>6} {'clients':>7} {'err':>4} "
+        f"{'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+
+
+def print_result(r):
+    print(
+        f"{r['mode']:<11} {r['stage']:<28} {r['requests']:>6} {r['clients']:>7} {r['errors']:>4} "
+        f"{r['rps']:>9.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f}"
+    )
+
+
+# ==========================================
+# SYNTHETIC ARTIFACTS
+# ==========================================
+
+# Real skill names exercise the high-demand / declining adjustments
+BASE_SKILLS = [
+    "Python", "SQL", "JavaScript", "TypeScript", "React", "Node.js", "Docker",
+    "Kubernetes", "AWS", "Java", "Go", "Excel", "Tableau", "Figma", "Git",
+    "Linux", "TensorFlow", "PyTorch", "Perl", "COBOL", "jQuery", "Flash",
+]
+
+# Columns the risk model is trained on (see engineered_features.csv)
+FEATURE_COLUMNS = [
+    "repo_ewma", "interest_ewma", "repo_trend",
+    "interest_trend", "repo_momentum_3m", "interest_momentum_3m",
+]
+
+
+def write_synthetic_artifacts(directory, rows=5000, n_skills=400, seed=0):
+    """
+    Mapping, embeddings (hash encoder), engineered features, model and
+    scaler in the layout server.py expects under AI_ARTIFACTS_DIR
+    """
+    import joblib
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    from embeddings import build_texts
+    from encoders import HashEncoder
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    # Outputs of an earlier run or build here no longer match the new files
+    shutil.rmtree(directory / "serving_bundle", ignore_errors=True)
+    for pattern in (
+        "*.clusters.npz", "*.representatives.npy", "*.representatives.scales.npy", "*.build.json"
+    ):
+        for path in directory.glob(pattern):
+            path.unlink()
+
+    skills = BASE_SKILLS + [f"Tool{i}" for i in range(n_skills - len(BASE_SKILLS))]
+    n_roles = max(1, rows // 4)
+    mapping = pd.DataFrame({
+        "Role": [f"Role {rng.integers(n_roles)}" for _ in range(rows)],
+        "Skill": [
+            ", ".join(rng.choice(skills, size=rng.integers(4, 11), replace=False))
+            for _ in range(rows)
+        ],
+    })
+    mapping.to_csv(directory / "embedding_index_mapping.csv", index=False)
+    np.save(
+        directory / "role_skill_embeddings.npy",
+        HashEncoder().encode(build_texts(mapping))
+    )
+
+    features = pd.DataFrame(
+        rng.normal(0, 10, size=(len(skills), len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS
+    )
+    features.insert(0, "skill", skills)
+    features.to_csv(directory / "engineered_features.csv", index=False)
+
+    X = features[FEATURE_COLUMNS]
+    y = (X["repo_trend"] + X["interest_trend"] < 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    model = GradientBoostingClassifier(n_estimators=50, random_state=seed)
+    model.fit(scaler.transform(X), y)
+    joblib.dump(model, directory / "skill_decline_risk_model.pkl")
+    joblib.dump(scaler, directory / "skill_scaler.pkl")
+
+    return directory
+
+
+def write_synthetic_roadmaps(directory, folders, nodes=150, seed=0):
+    """
+    developer-roadmap layout (src/data/roadmaps/<folder>/<folder>.json plus
+    content/<slug>@<node id>.md) for every folder roadmap_server can serve
+    """
+    rng = np.random.default_rng(seed)
+    alphabet = np.array(list("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"))
+    root = Path(directory) / "src/data/roadmaps"
+
+    for folder in sorted(set(folders)):
+        content = root / folder / "content"
+        content.mkdir(parents=True, exist_ok=True)
+
+        out_nodes, edges, topic = [], [], None
+        for i in range(nodes):
+            node_id = "".join(rng.choice(alphabet, 21))
+            ntype = "topic" if i % 6 == 0 else "subtopic"
+            label = BASE_SKILLS[i % len(BASE_SKILLS)] if i % 3 == 0 else f"{folder} concept {i}"
+            out_nodes.append({
+                "id": node_id,
+                "type": ntype,
+                "position": {"x": float(300 * (i % 6)), "y": float(60 * (i // 6))},
+                "data": {"label": label},
+                "style": {"width": 200, "height": 40},
+            })
+            if topic is not None:
+                edges.append({"id": f"e{i}", "source": topic, "target": node_id})
+            if ntype == "topic":
+                topic = node_id
+            slug = label.lower().replace(" ", "-")
+            (content / f"{slug}@{node_id}.md").write_text(
+                f"# {label}\n\n" + "Synthetic roadmap content. " * 40, encoding="utf-8"
+            )
+
+        # Decorations the extractor has to filter out
+        out_nodes.append({"id": "title", "type": "title", "data": {"label": folder}})
+        out_nodes.append({"id": "note", "type": "paragraph",
+                          "data": {"label": "Visit roadmap.sh for more details"}})
+
+        (root / folder / f"{folder}.json").write_text(
+            json.dumps({"nodes": out_nodes, "edges": edges}), encoding="utf-8"
+        )
+
+    return Path(directory)
+
+
+def make_queries(mapping_file, n, seed=0):
+    """
+    Distinct skills queries drawn from the mapping's skill vocabulary (so
+    the query cache does not hide encoder cost)
+    """
+    rng = np.random.default_rng(seed)
+    vocab = sorted({
+        s.strip() for skills in pd.read_csv(mapping_file)["Skill"].astype(str)
+        for s in skills.split(",") if s.strip()
+    })
+    queries = set()
+    while len(queries) < n:
+        size = min(len(vocab), int(rng.integers(2, 6)))
+        queries.add(", ".join(rng.choice(vocab, size=size, replace=False)))
+    return sorted(queries)
+
+
+# ==========================================
+# TARGETS
+# ==========================================
+
+def ai_stages(request, queries, n_requests):
+    """
+    (stage, call, payloads) for the AI endpoints given request(method, path, body)
+    """
+    batches = [
+        {"inputs": [{"text": q} for q in queries[i:i + ANALYZE_BATCH_SIZE]]}
+        for i in range(0, len(queries), ANALYZE_BATCH_SIZE)
+    ]
+    repeated = [queries[i % 16] for i in range(n_requests)]
+    return [
+        ("POST /analyze", lambda q: request("POST", "/analyze", {"text": q}), queries[:n_requests]),
+        ("POST /analyze (cached)", lambda q: request("POST", "/analyze", {"text": q}), repeated),
+        (f"POST /analyze/batch x{ANALYZE_BATCH_SIZE}",
+         lambda b: request("POST", "/analyze/batch", b), batches[:max(1, n_requests // 10)]),
+        ("GET /market-trends", lambda _: request("GET", "/market-trends"), [None] * n_requests),
+    ]
+
+
+def roadmap_stages(request, roles, n_requests, seed=0):
+    rng = np.random.default_rng(seed)
+    paths = [
+        "/api/roadmap?" + urlencode({
+            "role": roles[i % len(roles)],
+            "known": ",".join(rng.choice(BASE_SKILLS, size=3, replace=False)),
+        })
+        for i in range(n_requests)
+    ]
+    return [
+        ("GET /api/roadmap", lambda p: request("GET", p), paths),
+        ("GET /api/roles", lambda _: request("GET", "/api/roles"), [None] * n_requests),
+    ]
+
+
+def bench_ai_inprocess(results, args, queries):
+    from fastapi.testclient import TestClient
+
+    import server
+
+    with TestClient(server.app) as client:
+        wait_until(lambda: client.get("/ready").status_code == 200, "AI service")
+        print(f"# AI service ready: {client.get('/ready').json()['artifact_load_seconds']}")
+
+        # Stage breakdown of one /analyze, called directly (no HTTP, one client)
+        vectors = server.encode_queries(queries, update_cache=False)
+        hits = list(zip(*server.index.search(vectors, server.TOP_K)))
+        stages = [
+            ("stage: encode", lambda q: server.encode_queries([q], update_cache=False), queries),
+            ("stage: search", lambda v: server.index.search(v[None, :], server.TOP_K), list(vectors)),
+            ("stage: analysis", lambda hit: server.build_analysis(hit[0], hit[1], hit[0]), hits),
+        ]
+        if server.skill_bypass is not None:
+            stages.append((
+                "stage: skill_index",
+                lambda q: server.skill_bypass.search(server.normalize_query(q).split(", "), server.TOP_K),
+                queries
+            ))
+        for stage, call, payloads in stages:
+            bench_stage(results, "in-process", stage, call, payloads[:args.requests], 1)
+
+        def request(method, path, body=None):
+            return client.request(method, path, json=body).status_code
+
+        for stage, call, payloads in ai_stages(request, queries, args.requests):
+            bench_stage(results, "in-process", stage, call, payloads, args.clients)
+
+
+def bench_roadmap_inprocess(results, args, roles):
+    sys.path.insert(0, str(ROADMAP_DIR))
+    import roadmap_server
+
+    # Benchmark the watched configuration, as served: the checkout exists by
+    # now, so writing it does not count as a change
+    roadmap_server.start_watcher()
+
+    local = threading.local()
+
+    def request(method, path, body=None):
+        # Flask test clients are not shared between threads
+        if not hasattr(local, "client"):
+            local.client = roadmap_server.app.test_client()
+        return local.client.open(path, method=method, json=body).status_code
+
+    for stage, call, payloads in roadmap_stages(request, roles, args.requests):
+        bench_stage(results, "in-process", stage, call, payloads, args.clients)
+
+
+class HttpClient:
+    """
+    One keep-alive connection per client thread
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.local = threading.local()
+
+    def request(self, method, path, body=None):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        headers, data = {}, None
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+            data = json.dumps(body).encode("utf-8")
+        try:
+            conn.request(method, path, body=data, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self.local.conn = None
+            raise
+        return response.status
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until(check, what, timeout=READY_TIMEOUT_S, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{what} exited with code {process.returncode}")
+        try:
+            if check():
+                return
+        except (http.client.HTTPException, OSError):
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"{what} not ready after {timeout}s")
+
+
+@contextmanager
+def serve(command, cwd, env, port, ready_path, log_file, what):
+    """
+    Run a server subprocess until the block exits; its output goes to log_file
+    """
+    with open(log_file, "wb") as log:
+        process = subprocess.Popen(
+            command, cwd=cwd, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT
+        )
+        try:
+            client = HttpClient(port)
+            try:
+                wait_until(lambda: client.request("GET", ready_path) == 200, what, process=process)
+            except (RuntimeError, TimeoutError):
+                print(Path(log_file).read_text(encoding="utf-8", errors="replace")[-2000:])
+                raise
+            yield client
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def bench_ai_http(results, args, queries, env, workdir):
+    port = free_port()
+    command = [
+        sys.executable, "-m", "uvicorn", "server:app",
+        "--port", str(port), "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    with serve(command, BASE_DIR, env, port, "/ready", workdir / "ai_server.log", "AI service") as client:
+        for stage, call, payloads in ai_stages(client.request, queries, args.requests):
+            bench_stage(results, "http", stage, call, payloads, args.clients)
+
+
+def bench_roadmap_http(results, args, roles, env, workdir):
+    port = free_port()
+    command = [sys.executable, "-m", "flask", "--app", "roadmap_server", "run", "--port", str(port)]
+    with serve(command, ROADMAP_DIR, env, port, "/api/roles", workdir / "roadmap_server.log",
+               "roadmap server") as client:
+        for stage, call, payloads in roadmap_stages(client.request, roles, args.requests):
+            bench_stage(results, "http", stage, call, payloads, args.clients)
+
+
+# ==========================================
+# MAIN
+# ==========================================
+
+def check_limits(results, limits):
+    """
+    limits: ["STAGE=MS", ...] on p95; returns the violations
+    """
+    failures = []
+    for limit in limits:
+        stage, _, max_ms = limit.rpartition("=")
+        for r in results:
+            if r["stage"] == stage and r["p95_ms"] > float(max_ms):
+                failures.append(f"{r['mode']} {stage}: p95 {r['p95_ms']:.2f} ms > {max_ms} ms")
+            if r["stage"] == stage and r["errors"]:
+                failures.append(f"{r['mode']} {stage}: {r['errors']} failed requests")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI and roadmap services")
+    parser.add_argument("--target", choices=("ai", "roadmap", "all"), default="all")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="generate artifacts + roadmaps and use the hash stand-in encoder")
+    parser.add_argument("--rows", type=int, default=5000, help="synthetic mapping rows")
+    parser.add_argument("--encoder", default=None,
+                        help="ENCODER_BACKEND for the AI service (default: hash with --synthetic)")
+    parser.add_argument("--http", action="store_true", help="also benchmark over HTTP")
+    parser.add_argument("--http-only", action="store_true", help="skip the in-process runs")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --http")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="requests per stage")
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS, help="concurrent clients")
+    parser.add_argument("--workdir", default=None, help="where synthetic data and logs go")
+    parser.add_argument("--json", default=None, help="write results to this file")
+    parser.add_argument("--max-p95", action="append", default=[], metavar="STAGE=MS",
+                        help="fail when the stage's p95 latency exceeds MS (repeatable)")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="career-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    # The services read their configuration from the environment at import
+    env = {}
+    if args.synthetic:
+        env["AI_ARTIFACTS_DIR"] = str(workdir / "artifacts")
+        env["ROADMAP_REPO_PATH"] = str(workdir / "developer-roadmap")
+        env["ENCODER_BACKEND"] = args.encoder or "hash"
+    elif args.encoder:
+        env["ENCODER_BACKEND"] = args.encoder
+    os.environ.update(env)
+
+    if args.synthetic:
+        sys.path.insert(0, str(ROADMAP_DIR))
+        import roadmap_server
+
+        print(f"# Writing synthetic artifacts to {workdir}")
+        write_synthetic_artifacts(env["AI_ARTIFACTS_DIR"], rows=args.rows)
+        write_synthetic_roadmaps(env["ROADMAP_REPO_PATH"], roadmap_server.ROLE_TO_FOLDER.values())
+
+    artifacts_dir = Path(os.environ.get("AI_ARTIFACTS_DIR", BASE_DIR))
+    queries = make_queries(artifacts_dir / "embedding_index_mapping.csv", args.requests)
+
+    run_roadmap = args.target in ("roadmap", "all")
+    if run_roadmap and not Path(os.environ.get("ROADMAP_REPO_PATH", "")).is_dir():
+        print("# Skipping roadmap benchmarks: set ROADMAP_REPO_PATH or use --synthetic")
+        run_roadmap = False
+    if run_roadmap:
+        sys.path.insert(0, str(ROADMAP_DIR))
+        from roadmap_server import ROLE_TO_FOLDER
+        roles = [role.title() for role in ROLE_TO_FOLDER]
+
+    results = []
+    print_header()
+    if not args.http_only:
+        if args.target in ("ai", "all"):
+            bench_ai_inprocess(results, args, queries)
+        if run_roadmap:
+            bench_roadmap_inprocess(results, args, roles)
+    if args.http or args.http_only:
+        if args.target in ("ai", "all"):
+            bench_ai_http(results, args, queries, env, workdir)
+        if run_roadmap:
+            bench_roadmap_http(results, args, roles, env, workdir)
+
+    if args.json:
+        config = {k: v for k, v in vars(args).items() if k != "json"}
+        Path(args.json).write_text(
+            json.dumps({"config": config, "results": results}, indent=2), encoding="utf-8"
+        )
+        print(f"# Results written to {args.json}")
+
+    failures = check_limits(results, args.max_p95)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
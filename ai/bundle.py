@@ -0,0 +1,280 @@
+# ==========================================
+# bundle.py
+# Versioned serving bundle for server.py
+# ==========================================
+#
+# Packs everything the server needs into one directory of .npy files,
+# so startup is a handful of mmaps instead of CSV parsing + unpickling:
+#
+#   serving_bundle/
+#     CURRENT                  <- name of the live version
+#     20261018T101500Z-1a2b3c4d/
+#       manifest.json          <- format, version, shapes, sha256 per file
+#       embeddings.npy         <- float32 / float16 / int8 (+ .scales.npy)
+#       role_names.npy ...     <- pre-parsed mapping (see mapping.py)
+#       risk_skills.npy        <- engineered_features.csv skill column
+#       risk_scores.npy        <- model decline probability per skill row
+#       clusters.npz           <- near-duplicate clusters (see dedup.py), if built
+#       representatives.npy    <- their representative vectors (+ .scales.npy)
+#
+# Embeddings and mapping are checked to line up at build time, and every
+# file is checksummed, so the two can never drift apart in production.
+# Opening a bundle checks file sizes against the manifest; the full sha256
+# check is opt-in (verify="sha256"), as it reads every byte.
+#
+# A rebuild with unchanged content re-points CURRENT at the existing
+# version instead of copying it again, and only the newest KEEP_VERSIONS
+# versions (plus the live one) are kept on disk.
+#
+# Build (also run at the end of embeddings.py):
+#   python bundle.py
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from dedup import clusters_path, representatives_path
+from encoders import MODEL_NAME
+from mapping import RoleSkillTable
+from retrieval import check_build_manifest, load_embeddings, scales_path, sha256_file
+from skill_risk import load_and_score
+
+BASE_DIR = Path(__file__).resolve().parent
+
+BUNDLE_FORMAT = 1
+BUNDLE_DIR = BASE_DIR / "serving_bundle"
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+# Versions kept for rollback; older ones are deleted after each build
+KEEP_VERSIONS = 3
+
+# open_bundle() checks: "size" (manifest byte counts), "sha256" or "off"
+VERIFY_MODES = ("size", "sha256", "off")
+
+
+def content_hash(files, model_name):
+    return hashlib.sha256(
+        ("".join(f["sha256"] for f in files.values()) + model_name).encode()
+    ).hexdigest()
+
+
+def read_manifest(path):
+    return json.loads((Path(path) / MANIFEST_FILE).read_text(encoding="utf-8"))
+
+
+def set_current(bundle_dir, version):
+    current_tmp = bundle_dir / (CURRENT_FILE + ".tmp")
+    current_tmp.write_text(version, encoding="utf-8")
+    os.replace(current_tmp, bundle_dir / CURRENT_FILE)
+
+
+def list_versions(bundle_dir):
+    """
+    Version directory names, oldest first (names start with the UTC build time)
+    """
+    return sorted(
+        p.name for p in Path(bundle_dir).iterdir()
+        if p.is_dir() and not p.name.startswith(".") and (p / MANIFEST_FILE).exists()
+    )
+
+
+def find_version(bundle_dir, digest):
+    """
+    Existing version with this content hash, or None
+    """
+    for version in list_versions(bundle_dir):
+        if not version.endswith("-" + digest[:8]):
+            continue
+        try:
+            manifest = read_manifest(bundle_dir / version)
+        except (OSError, ValueError):
+            continue
+        if manifest.get("content_hash") == digest:
+            return version
+    return None
+
+
+def prune_versions(bundle_dir, keep=KEEP_VERSIONS):
+    """
+    Delete all but the newest `keep` versions; the live one always stays.
+    A server still mapping a deleted version keeps its open files (POSIX);
+    where deletion fails (Windows) the version is left for the next build.
+    """
+    bundle_dir = Path(bundle_dir)
+    live = current_bundle_path(bundle_dir)
+    versions = list_versions(bundle_dir)
+    for version in versions[:max(0, len(versions) - keep)]:
+        if live is not None and version == live.name:
+            continue
+        shutil.rmtree(bundle_dir / version, ignore_errors=True)
+
+
+# ==========================================
+# BUILD
+# ==========================================
+
+def build_bundle(
+    embeddings_file=BASE_DIR / "role_skill_embeddings.npy",
+    mapping_file=BASE_DIR / "embedding_index_mapping.csv",
+    features_file=BASE_DIR / "engineered_features.csv",
+    model_file=BASE_DIR / "skill_decline_risk_model.pkl",
+    scaler_file=BASE_DIR / "skill_scaler.pkl",
+    bundle_dir=BUNDLE_DIR,
+    model_name=MODEL_NAME,
+    keep=KEEP_VERSIONS,
+):
+    """
+    Write a new bundle version, or find the existing one with the same
+    content, and point CURRENT at it. Returns its path.
+    """
+    bundle_dir = Path(bundle_dir)
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+
+    check_build_manifest(embeddings_file, mapping_file)
+    embeddings = load_embeddings(embeddings_file)
+    table = RoleSkillTable.from_csv(mapping_file)
+    if len(embeddings) != len(table):
+        raise ValueError(
+            f"{embeddings_file} has {len(embeddings)} rows but "
+            f"{mapping_file} has {len(table)}"
+        )
+
+    features, _, _, probs = load_and_score(features_file, model_file, scaler_file)
+
+    staging = bundle_dir / f".staging-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+
+    shutil.copyfile(embeddings_file, staging / "embeddings.npy")
+    if embeddings.scales is not None:
+        shutil.copyfile(scales_path(embeddings_file), scales_path(staging / "embeddings.npy"))
+    vectors_file = representatives_path(embeddings_file)
+    if clusters_path(embeddings_file).exists() and vectors_file.exists():
+        shutil.copyfile(clusters_path(embeddings_file), staging / "clusters.npz")
+        shutil.copyfile(vectors_file, staging / "representatives.npy")
+        if embeddings.scales is not None:
+            shutil.copyfile(scales_path(vectors_file), scales_path(staging / "representatives.npy"))
+    table.save_arrays(staging)
+    np.save(staging / "risk_skills.npy", features["skill"].astype(str).to_numpy(dtype=str))
+    np.save(staging / "risk_scores.npy", np.asarray(probs, dtype=np.float64))
+
+    files = {
+        path.name: {"sha256": sha256_file(path), "bytes": path.stat().st_size}
+        for path in sorted(staging.glob("*.np[yz]"))
+    }
+    digest = content_hash(files, model_name)
+
+    existing = find_version(bundle_dir, digest)
+    if existing is not None:
+        shutil.rmtree(staging)
+        target = bundle_dir / existing
+        open_bundle(target, verify="size")
+        set_current(bundle_dir, existing)
+        prune_versions(bundle_dir, keep)
+        return target
+
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + digest[:8]
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": version,
+        "created_utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "model_name": model_name,
+        "rows": len(table),
+        "dim": int(embeddings.shape[1]),
+        "storage_dtype": embeddings.dtype,
+        "risk_rows": len(probs),
+        "content_hash": digest,
+        "files": files,
+    }
+    (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    # Publish: rename the finished directory, then swap CURRENT atomically
+    target = bundle_dir / version
+    os.replace(staging, target)
+    set_current(bundle_dir, version)
+    prune_versions(bundle_dir, keep)
+
+    return target
+
+
+# ==========================================
+# OPEN
+# ==========================================
+
+class ServingBundle:
+
+    def __init__(self, path, manifest, embeddings, role_table, risk_skills, risk_scores):
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest["version"]
+        self.embeddings = embeddings
+        self.role_table = role_table
+        self.risk_skills = risk_skills
+        self.risk_scores = risk_scores
+        # Loaded by the server (which decides whether to use them)
+        self.clusters_file = path / "clusters.npz" if "clusters.npz" in manifest["files"] else None
+        self.representatives_file = path / "representatives.npy"
+
+
+def current_bundle_path(bundle_dir=BUNDLE_DIR):
+    """
+    Directory of the live version, or None when no bundle has been built
+    """
+    current = Path(bundle_dir) / CURRENT_FILE
+    if not current.exists():
+        return None
+    return Path(bundle_dir) / current.read_text(encoding="utf-8").strip()
+
+
+def published_ns(bundle_dir=BUNDLE_DIR):
+    """
+    When CURRENT was last pointed at a version (st_mtime_ns), or None.
+    Written after the manifest on every build, including a reused version.
+    """
+    current = Path(bundle_dir) / CURRENT_FILE
+    return current.stat().st_mtime_ns if current.exists() else None
+
+
+def open_bundle(path, verify="size"):
+    """
+    Memory-map a bundle version. verify (see VERIFY_MODES) checks every
+    file against its manifest size or, with "sha256", its checksum first.
+    """
+    if verify not in VERIFY_MODES:
+        raise ValueError(f"Unknown verify mode '{verify}', expected one of {VERIFY_MODES}")
+    path = Path(path)
+    manifest = read_manifest(path)
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported bundle format {manifest.get('format')} in {path}")
+
+    for name, expected in manifest["files"].items():
+        if verify == "size" and (path / name).stat().st_size != expected["bytes"]:
+            raise ValueError(f"Size mismatch for {path / name}")
+        if verify == "sha256" and sha256_file(path / name) != expected["sha256"]:
+            raise ValueError(f"Checksum mismatch for {path / name}")
+
+    embeddings = load_embeddings(path / "embeddings.npy")
+    role_table = RoleSkillTable.load_arrays(path)
+    if len(embeddings) != manifest["rows"] or len(role_table) != manifest["rows"]:
+        raise ValueError(f"Bundle {path} does not match its manifest row count")
+
+    return ServingBundle(
+        path,
+        manifest,
+        embeddings,
+        role_table,
+        np.load(path / "risk_skills.npy").tolist(),
+        np.load(path / "risk_scores.npy", mmap_mode="r"),
+    )
+
+
+if __name__ == "__main__":
+    target = build_bundle()
+    print(f"Bundle written to: {target}")
@@ -1,7 +1,12 @@
-import numpy as np
+import argparse
+import json
+import sys
+import time
+
 import pandas as pd
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+
+from encoders import ENCODER_BACKENDS, load_encoder
+from retrieval import ExactIndex, check_build_manifest, load_embeddings
 
 # ==========================================
 # CONFIG
@@ -10,55 +15,179 @@ from sklearn.metrics.pairwise import cosine_similarity
 EMBEDDINGS_FILE = r"E:\baba bandooks\role_skill_embeddings.npy"
 MAPPING_FILE = r"E:\baba bandooks\embedding_index_mapping.csv"
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+ENCODER_BACKEND = "torch"   # "torch", "onnx" or "onnx-int8" (see encoders.py)
 TOP_K = 5
 
+# Batch mode encodes and searches this many queries at a time
+BATCH_SIZE = 256
+
+QUIT_COMMANDS = {"quit", "exit", ":q"}
+
 # ==========================================
-# LOAD DATA
+# USAGE
 # ==========================================
+#
+# Interactive (everything stays loaded between queries):
+#   python cosinesimilarity.py
+#
+# Batch: one query per line, or JSONL objects with a "text" field (other
+# fields, e.g. an id or expected role, are copied to the output line):
+#   python cosinesimilarity.py --batch queries.txt --output results.jsonl
+#   cat queries.jsonl | python cosinesimilarity.py --batch - > results.jsonl
 
-print("Loading embeddings...")
-embeddings = np.load(EMBEDDINGS_FILE)
 
-print("Loading mapping file...")
-mapping_df = pd.read_csv(MAPPING_FILE)
+def log(message):
+    # stdout may be the JSONL output, keep progress on stderr
+    print(message, file=sys.stderr)
 
-print("Loading MiniLM model...")
-model = SentenceTransformer(MODEL_NAME)
 
 # ==========================================
-# USER INPUT
+# LOAD DATA
 # ==========================================
 
-user_input = input("\nEnter your query (role or skills): ")
+class QueryTool:
+
+    def __init__(self, embeddings_file, mapping_file, backend=ENCODER_BACKEND, model_name=MODEL_NAME):
+        log("Loading embeddings...")
+        check_build_manifest(embeddings_file, mapping_file)
+        self.index = ExactIndex(load_embeddings(embeddings_file))
+
+        log("Loading mapping file...")
+        mapping_df = pd.read_csv(mapping_file)
+        self.roles = mapping_df["Role"].astype(str).tolist()
+        self.skills = mapping_df["Skill"].astype(str).tolist()
+        if len(mapping_df) != len(self.index):
+            raise ValueError(
+                f"{mapping_file} has {len(mapping_df)} rows but "
+                f"{embeddings_file} has {len(self.index)}"
+            )
+
+        log(f"Loading MiniLM model ({backend})...")
+        self.model = load_encoder(backend, model_name)
+
+    def search(self, queries, top_k=TOP_K, batch_size=BATCH_SIZE):
+        """
+        Top-k matches for every query: a list of [{rank, score, row, role, skills}]
+        """
+        results = []
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            query_embeddings = self.model.encode(batch, batch_size=batch_size)
+            scores, indices = self.index.search(query_embeddings, top_k)
+
+            for row_scores, row_indices in zip(scores, indices):
+                results.append([
+                    {
+                        "rank": rank,
+                        "score": float(score),
+                        "row": int(idx),
+                        "role": self.roles[idx],
+                        "skills": self.skills[idx]
+                    }
+                    for rank, (score, idx) in enumerate(zip(row_scores, row_indices), 1)
+                ])
+        return results
 
-# Convert user query to embedding
-query_embedding = model.encode(
-    [user_input],
-    convert_to_numpy=True,
-    normalize_embeddings=True
-)
 
 # ==========================================
-# COSINE SIMILARITY
-# ======================p====================
+# INTERACTIVE MODE
+# ==========================================
 
-similarities = cosine_similarity(query_embedding, embeddings)[0]
+def display(matches):
+    print(f"\nTop {len(matches)} Most Similar Roles + Skills:\n")
 
-# Get top K indices
-top_indices = np.argsort(similarities)[-TOP_K:][::-1]
+    for match in matches:
+        print(f"{match['rank']}. Similarity Score: {match['score']:.4f}")
+        print(f"   Role  : {match['role']}")
+        print(f"   Skills: {match['skills']}")
+        print("-" * 60)
 
-# ==========================================
-# DISPLAY RESULTS
-# ==========================================
 
-print("\nTop 5 Most Similar Roles + Skills:\n")
+def run_interactive(tool, top_k):
+    print("\nType a query, or 'quit' to exit.")
+    while True:
+        try:
+            user_input = input("\nEnter your query (role or skills): ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            return
+
+        if not user_input:
+            continue
+        if user_input.lower() in QUIT_COMMANDS:
+            return
+
+        display(tool.search([user_input], top_k)[0])
 
-for rank, idx in enumerate(top_indices, 1):
-    score = similarities[idx]
-    role = mapping_df.iloc[idx]["Role"]
-    skills = mapping_df.iloc[idx]["Skill"]
 
-    print(f"{rank}. Similarity Score: {score:.4f}")
-    print(f"   Role  : {role}")
-    print(f"   Skills: {skills}")
-    print("-" * 60)
\ No newline at end of file
+# ==========================================
+# BATCH MODE
+# ==========================================
+
+def read_queries(lines):
+    """
+    Parse batch input into (line_number, record) pairs; record always has "text"
+    """
+    queries = []
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            record = json.loads(line)
+            if "text" not in record:
+                raise ValueError(f"Line {line_number}: JSON query without a 'text' field")
+        else:
+            record = {"text": line}
+        queries.append((line_number, record))
+    return queries
+
+
+def run_batch(tool, source, destination, top_k, batch_size):
+    queries = read_queries(source)
+    log(f"Searching {len(queries)} queries...")
+
+    start = time.perf_counter()
+    results = tool.search([record["text"] for _, record in queries], top_k, batch_size)
+    elapsed = time.perf_counter() - start
+
+    for (line_number, record), matches in zip(queries, results):
+        destination.write(json.dumps({**record, "line": line_number, "results": matches}) + "\n")
+
+    if queries:
+        log(f"Done: {len(queries)} queries in {elapsed:.2f}s "
+            f"({1000 * elapsed / len(queries):.2f} ms/query)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the roles closest to a skills query")
+    parser.add_argument("--embeddings", default=EMBEDDINGS_FILE)
+    parser.add_argument("--mapping", default=MAPPING_FILE)
+    parser.add_argument("--backend", default=ENCODER_BACKEND, choices=ENCODER_BACKENDS)
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--batch", metavar="FILE",
+                        help="read queries from FILE ('-' for stdin) and write JSONL results")
+    parser.add_argument("--output", metavar="FILE",
+                        help="JSONL output file for --batch (default stdout)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    tool = QueryTool(args.embeddings, args.mapping, args.backend)
+
+    if args.batch is None:
+        run_interactive(tool, args.top_k)
+        return
+
+    source = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+    destination = sys.stdout if args.output is None else open(args.output, "w", encoding="utf-8")
+    try:
+        run_batch(tool, source, destination, args.top_k, args.batch_size)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if destination is not sys.stdout:
+            destination.close()
+
+
+if __name__ == "__main__":
+    main()
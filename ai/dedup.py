@@ -0,0 +1,221 @@
+# ==========================================
+# dedup.py
+# Near-duplicate collapse of role/skill rows
+# ==========================================
+#
+# The mapping has many rows for the same role with almost the same skill
+# list. Each would be its own vector, cost a dot product per query and
+# often take several of the top-k slots. At build time rows of the same
+# role whose embeddings are within DEDUP_THRESHOLD cosine similarity are
+# grouped into one cluster:
+#
+#   representatives[c]                     -> mapping row searched for c
+#   members[indptr[c]:indptr[c + 1]]       -> every mapping row in c
+#
+# The server only searches the representative vectors and expands the
+# member rows of the hits it returns. Those vectors are written to their
+# own .npy next to the clusters, so the server can memory-map them.
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+from retrieval import save_stored, scales_path
+
+DEDUP_THRESHOLD = 0.95
+
+# Rows scored against the leaders found so far with one matmul
+DEDUP_BLOCK_ROWS = 4096
+
+# The leader pass is quadratic in the distinct rows of a role; larger role
+# groups are still collapsed, with a warning
+DEDUP_WARN_GROUP_ROWS = 100_000
+
+
+def clusters_path(path):
+    """
+    Cluster file stored next to an embeddings .npy
+    """
+    path = Path(path)
+    return path.with_name(path.stem + ".clusters.npz")
+
+
+def representatives_path(path):
+    """
+    Representative vectors stored next to an embeddings .npy
+    """
+    path = Path(path)
+    return path.with_name(path.stem + ".representatives.npy")
+
+
+class NearDuplicateClusters:
+
+    def __init__(self, representatives, indptr, members, threshold):
+        self.representatives = representatives
+        self.indptr = indptr
+        self.members = members
+        self.threshold = float(threshold)
+
+        self.row_cluster = np.empty(len(members), dtype=np.int32)
+        self.row_cluster[members] = np.repeat(
+            np.arange(len(representatives), dtype=np.int32), np.diff(indptr)
+        )
+
+    def __len__(self):
+        return len(self.representatives)
+
+    @property
+    def rows(self):
+        return len(self.members)
+
+    def members_of_row(self, row):
+        """
+        All mapping rows in the cluster of `row` (its representative first)
+        """
+        cluster = self.row_cluster[row]
+        return self.members[self.indptr[cluster]:self.indptr[cluster + 1]]
+
+    def describe(self):
+        return {
+            "rows": self.rows,
+            "clusters": len(self),
+            "threshold": self.threshold,
+            "largest_cluster": int(np.diff(self.indptr).max()) if len(self) else 0,
+        }
+
+    def save(self, path):
+        # Through a file object so np.savez does not append ".npz" to tmp names
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                representatives=self.representatives,
+                indptr=self.indptr,
+                members=self.members,
+                threshold=np.float64(self.threshold),
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["representatives"],
+                data["indptr"],
+                data["members"],
+                data["threshold"],
+            )
+
+
+def collapse_group(vectors, rows, threshold, block_rows=DEDUP_BLOCK_ROWS):
+    """
+    Leader clustering of one group's rows (ascending): each row joins the
+    earliest leader it is >= threshold similar to, or becomes a leader.
+    Rows are scored a block at a time against all leaders so far; only
+    rows left without a leader are resolved one by one, within the block.
+    Returns the member rows of each cluster.
+    """
+    leaders = np.empty((min(len(rows), block_rows), vectors.shape[1]), dtype=np.float32)
+    n_leaders = 0
+    owner = np.empty(len(rows), dtype=np.int64)   # leader number of each row
+
+    for start in range(0, len(rows), block_rows):
+        block = vectors.rows(rows[start:start + block_rows])
+        block_owner = np.full(len(block), -1, dtype=np.int64)
+        if n_leaders:
+            joined = (block @ leaders[:n_leaders].T) >= threshold
+            matched = joined.any(axis=1)
+            block_owner[matched] = joined[matched].argmax(axis=1)
+
+        unmatched = np.flatnonzero(block_owner < 0)
+        similar = (block[unmatched] @ block[unmatched].T) >= threshold
+        for i, position in enumerate(unmatched):
+            if block_owner[position] >= 0:
+                continue
+            if n_leaders == len(leaders):
+                leaders = np.concatenate([leaders, np.empty_like(leaders)])
+            leaders[n_leaders] = block[position]
+            later = unmatched[i:][similar[i, i:] & (block_owner[unmatched[i:]] < 0)]
+            block_owner[later] = n_leaders
+            block_owner[position] = n_leaders
+            n_leaders += 1
+
+        owner[start:start + len(block)] = block_owner
+
+    order = np.argsort(owner, kind="stable")
+    return np.split(rows[order], np.flatnonzero(np.diff(owner[order])) + 1)
+
+
+def collapse_near_duplicates(vectors, group_ids, threshold=DEDUP_THRESHOLD):
+    """
+    Greedy leader clustering within each group (role): the first unassigned
+    row becomes a representative and absorbs every unassigned row of its
+    group with cosine similarity >= threshold. Rows of different groups are
+    never merged.
+    """
+    group_ids = np.asarray(group_ids)
+    order = np.argsort(group_ids, kind="stable")
+    boundaries = np.flatnonzero(np.diff(group_ids[order])) + 1
+
+    clusters = []
+    for rows in np.split(order, boundaries):
+        if len(rows) == 0:
+            continue
+        if len(rows) > DEDUP_WARN_GROUP_ROWS:
+            print(
+                f"WARNING: role group {group_ids[rows[0]]} has {len(rows)} rows, "
+                f"near-duplicate collapse is quadratic in its distinct rows"
+            )
+        clusters.extend(collapse_group(vectors, rows, threshold))
+
+    clusters.sort(key=lambda members: members[0])
+    sizes = [len(members) for members in clusters]
+
+    return NearDuplicateClusters(
+        np.asarray([members[0] for members in clusters], dtype=np.int64),
+        np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+        np.concatenate(clusters).astype(np.int64) if clusters else np.empty(0, np.int64),
+        threshold,
+    )
+
+
+def write_clusters(vectors, group_ids, path, vectors_path, threshold=DEDUP_THRESHOLD):
+    """
+    Collapse and save atomically, the representative vectors (in the storage
+    dtype of `vectors`) to vectors_path and the clusters to path; returns
+    the clusters
+    """
+    clusters = collapse_near_duplicates(vectors, group_ids, threshold)
+
+    # Vectors first: a clusters file is never newer than its vectors
+    vectors_tmp = Path(vectors_path).with_name(Path(vectors_path).stem + ".tmp.npy")
+    representatives = vectors.subset(clusters.representatives)
+    save_stored(vectors_tmp, representatives)
+    if representatives.scales is not None:
+        os.replace(scales_path(vectors_tmp), scales_path(vectors_path))
+    os.replace(vectors_tmp, vectors_path)
+
+    tmp = Path(str(path) + ".tmp")
+    clusters.save(tmp)
+    os.replace(tmp, path)
+    return clusters
+
+
+class ClusteredIndex:
+    """
+    Wraps an index built over the representative vectors only; hits are
+    reported as mapping row ids (the representative's row).
+    """
+
+    def __init__(self, index, clusters):
+        self.index = index
+        self.clusters = clusters
+
+    def __len__(self):
+        return len(self.index)
+
+    def search(self, queries, k):
+        scores, positions = self.index.search(queries, k)
+        return scores, self.clusters.representatives[positions]
+
+    def describe(self):
+        return {**self.index.describe(), "near_duplicates": self.clusters.describe()}
@@ -1,6 +1,24 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import (
+    ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
+)
+from pathlib import Path
+
 import pandas as pd
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from bundle import build_bundle
+from dedup import DEDUP_THRESHOLD, clusters_path, representatives_path, write_clusters
+from encoders import load_encoder
+from mapping import RoleSkillTable
+from retrieval import (
+    StoredVectors, build_manifest_path, check_build_manifest, compare_storage_formats,
+    load_embeddings, save_embeddings, scales_path, write_build_manifest
+)
 
 # ==========================================
 # CONFIG
@@ -12,77 +30,577 @@ OUTPUT_MAPPING_FILE = "embedding_index_mapping.csv"
 
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"  # MiniLM v2
 
+# Encoder runtime: "torch", "onnx" or "onnx-int8" (see encoders.py).
+# Vectors must come from the same backend the server queries with.
+ENCODER_BACKEND = "torch"
+
+# Storage format of OUTPUT_EMB_FILE:
+#   "float32" - full precision
+#   "float16" - half the size, ~no recall loss
+#   "int8"    - quarter size, per-vector scale saved next to it
+#               (role_skill_embeddings.scales.npy)
+# server.py detects the format from the file.
+EMBEDDINGS_DTYPE = "float32"
+
+# "incremental" reuses vectors of rows whose "Role | Skill" text (and
+# model/backend) is unchanged since the previous outputs and only encodes
+# new or edited rows. "full" re-encodes everything.
+# "stream" is for CSVs too large for memory: the CSV is read in chunks,
+# chunks are encoded by a pool of worker processes straight into a
+# memory-mapped output file, and an interrupted run resumes from its
+# checkpoint (completed chunks are not re-encoded).
+BUILD_MODE = "incremental"
+
+ENCODE_BATCH_SIZE = 32
+
+# Sort texts by token length before batching so each batch pads to a
+# similar length (order is restored on output); reports tokens/s and the
+# share of padding tokens
+LENGTH_BUCKETING = True
+
+# Stream mode
+STREAM_CHUNK_ROWS = 10000
+STREAM_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+CHECKPOINT_FILE = "role_skill_embeddings.checkpoint.json"
+
+# Print recall / latency / size of each storage format after building
+REPORT_STORAGE_FORMATS = True
+
+# Group rows of the same role whose vectors are >= DEDUP_THRESHOLD cosine
+# similar; the server searches one vector per group (see dedup.py)
+COLLAPSE_NEAR_DUPLICATES = True
+
+# Package the outputs (plus risk scores) as a new serving bundle version
+# for server.py - see bundle.py
+BUILD_SERVING_BUNDLE = True
+SERVING_BUNDLE_DIR = "serving_bundle"
+
 # ==========================================
 # LOAD CSV
 # ==========================================
 
-df = pd.read_csv(INPUT_CSV)
+def check_columns(df):
+    # Ensure required columns exist
+    required_columns = ["Role", "Skill"]
+
+    for col in required_columns:
+        if col not in df.columns:
+            raise ValueError(f"Column '{col}' not found in CSV")
 
-print("Columns in dataset:", df.columns.tolist())
 
-# Ensure required columns exist
-required_columns = ["Role", "Skill"]
+def load_mapping_csv(path):
+    df = pd.read_csv(path)
 
-for col in required_columns:
-    if col not in df.columns:
-        raise ValueError(f"Column '{col}' not found in CSV")
+    print("Columns in dataset:", df.columns.tolist())
+    check_columns(df)
 
-# Preserve original CSV index
-df["original_index"] = df.index
+    # Preserve original CSV index
+    df["original_index"] = df.index
+    return df
 
 # ==========================================
 # CLEAN + COMBINE ROLE + SKILLS
 # ==========================================
 
-# Clean skill column (remove extra spaces)
-df["Skill"] = df["Skill"].astype(str).apply(
-    lambda x: ", ".join([s.strip() for s in x.split(",")])
-)
+def clean_skills(df):
+    # Clean skill column (remove extra spaces)
+    df["Skill"] = df["Skill"].astype(str).apply(
+        lambda x: ", ".join([s.strip() for s in x.split(",")])
+    )
+    return df
+
+
+def build_texts(df):
+    # Combine Role + skill into one text string
+    return (
+        df["Role"].astype(str) + " | " +
+        df["Skill"].astype(str)
+    ).tolist()
+
 
-# Combine Role + skill into one text string
-texts = (
-    df["Role"].astype(str) + " | " +
-    df["Skill"].astype(str)
-).tolist()
+def text_hash(text):
+    """
+    Identity of a row's vector: the encoded text plus what encoded it
+    """
+    key = f"{MODEL_NAME}|{ENCODER_BACKEND}\n{text}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
 
 # ==========================================
-# LOAD MODEL
+# LENGTH-BUCKETED ENCODING
 # ==========================================
 
-print("Loading MiniLM v2 model...")
-model = SentenceTransformer(MODEL_NAME)
+def token_lengths(model, texts):
+    """
+    Tokens per text as the encoder sees them (special tokens, truncation)
+    """
+    encoded = model.tokenizer(
+        texts,
+        add_special_tokens=True,
+        truncation=True,
+        max_length=model.max_seq_length
+    )
+    return np.array([len(ids) for ids in encoded["input_ids"]], dtype=np.int64)
+
+
+def padded_tokens(lengths, batch_size):
+    """
+    Tokens actually computed when every batch pads to its longest member
+    """
+    return int(sum(
+        lengths[i:i + batch_size].max() * len(lengths[i:i + batch_size])
+        for i in range(0, len(lengths), batch_size)
+    ))
+
+
+def encode_texts(model, texts, batch_size=ENCODE_BATCH_SIZE, show_progress_bar=False):
+    """
+    Encode texts, batching them in token-length order when LENGTH_BUCKETING
+    is on. Returns (vectors in input order, stats).
+    """
+    lengths = token_lengths(model, texts)
+    if LENGTH_BUCKETING:
+        # Longest first, like sentence-transformers does within one call
+        order = np.argsort(-lengths, kind="stable")
+    else:
+        order = np.arange(len(texts))
+
+    batches = range(0, len(texts), batch_size)
+    if show_progress_bar:
+        from tqdm import tqdm
+        batches = tqdm(batches, desc="Batches")
+
+    vectors = np.empty((len(texts), model.dimension), dtype=np.float32)
+    start = time.perf_counter()
+    for i in batches:
+        rows = order[i:i + batch_size]
+        # One call per batch, so the batch composition is exactly ours
+        vectors[rows] = model.encode([texts[r] for r in rows], batch_size=len(rows))
+    seconds = time.perf_counter() - start
+
+    stats = {
+        "texts": len(texts),
+        "tokens": int(lengths.sum()),
+        "padded_tokens": padded_tokens(lengths[order], batch_size),
+        "unsorted_padded_tokens": padded_tokens(lengths, batch_size),
+        "seconds": seconds,
+    }
+    return vectors, stats
+
+
+def merge_stats(total, stats):
+    for key, value in stats.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def report_encode_stats(stats):
+    if not stats.get("texts"):
+        return
+    padding = 1 - stats["tokens"] / stats["padded_tokens"]
+    unsorted_padding = 1 - stats["tokens"] / stats["unsorted_padded_tokens"]
+    print(
+        f"Encoded {stats['texts']} texts, {stats['tokens']} tokens: "
+        f"{stats['tokens'] / max(stats['seconds'], 1e-9):,.0f} tokens/s, "
+        f"padding {padding:.1%} of computed tokens "
+        f"(CSV order would be {unsorted_padding:.1%})"
+    )
 
 # ==========================================
-# GENERATE EMBEDDINGS
+# REUSE PREVIOUS BUILD
 # ==========================================
 
-print("Generating embeddings...")
-embeddings = model.encode(
-    texts,
-    batch_size=32,
-    show_progress_bar=True,
-    convert_to_numpy=True,
-    normalize_embeddings=True  # important for cosine similarity
-)
+def load_previous_vectors():
+    """
+    {text_hash: float32 vector} from the last build, or {} if there is none
+    or it cannot be reused
+    """
+    if not (Path(OUTPUT_EMB_FILE).exists() and Path(OUTPUT_MAPPING_FILE).exists()):
+        return {}
+
+    try:
+        check_build_manifest(OUTPUT_EMB_FILE, OUTPUT_MAPPING_FILE)
+    except ValueError as e:
+        print(f"Previous outputs are not from one build ({e}), ignoring them")
+        return {}
+
+    previous = pd.read_csv(OUTPUT_MAPPING_FILE)
+    vectors = load_embeddings(OUTPUT_EMB_FILE, mmap=False)
+    if len(previous) != len(vectors):
+        print("Previous mapping and embeddings disagree in length, ignoring them")
+        return {}
+
+    if "text_hash" not in previous.columns:
+        # Outputs from before hashes were stored: the model is unknown
+        print("Previous mapping has no text hashes, ignoring it")
+        return {}
+
+    # Lossy vectors would carry their rounding into a more precise build;
+    # float16 / int8 survive a round trip to their own dtype unchanged
+    if vectors.dtype not in ("float32", EMBEDDINGS_DTYPE):
+        print(f"Previous embeddings are stored as {vectors.dtype}, ignoring them")
+        return {}
 
-print("Embeddings shape:", embeddings.shape)
+    decoded = vectors.rows(slice(None))
+    return {h: decoded[i] for i, h in enumerate(previous["text_hash"])}
+
+
+def generate_embeddings(model, texts, hashes):
+    previous = load_previous_vectors() if BUILD_MODE == "incremental" else {}
+
+    todo = [i for i, h in enumerate(hashes) if h not in previous]
+    print(f"Reusing {len(texts) - len(todo)} vectors, encoding {len(todo)} rows")
+
+    embeddings = np.empty((len(texts), model.dimension), dtype=np.float32)
+    for i, h in enumerate(hashes):
+        if h in previous:
+            embeddings[i] = previous[h]
+
+    if todo:
+        embeddings[todo], stats = encode_texts(
+            model,
+            [texts[i] for i in todo],
+            show_progress_bar=True
+        )  # normalized - important for cosine similarity
+        report_encode_stats(stats)
+
+    return embeddings
 
 # ==========================================
 # SAVE OUTPUT
 # ==========================================
 
-# Save embeddings
-np.save(OUTPUT_EMB_FILE, embeddings)
+def tmp_path(path):
+    path = Path(path)
+    return path.with_name(path.stem + ".tmp" + path.suffix)
+
+
+def replace_outputs(emb_tmp, mapping_tmp):
+    """
+    Record the finished temp files in a build manifest, then os.replace()
+    each into place, the manifest last. A crash in between leaves the
+    previous manifest behind, which no longer matches, so loaders refuse
+    the mixed set (see retrieval.check_build_manifest).
+    """
+    manifest_file = build_manifest_path(OUTPUT_EMB_FILE)
+    manifest_tmp = tmp_path(manifest_file)
+    write_build_manifest(
+        emb_tmp, mapping_tmp, manifest_tmp,
+        model_name=MODEL_NAME, backend=ENCODER_BACKEND, storage_dtype=EMBEDDINGS_DTYPE
+    )
+
+    if EMBEDDINGS_DTYPE == "int8":
+        os.replace(scales_path(emb_tmp), scales_path(OUTPUT_EMB_FILE))
+    os.replace(emb_tmp, OUTPUT_EMB_FILE)
+    os.replace(mapping_tmp, OUTPUT_MAPPING_FILE)
+    os.replace(manifest_tmp, manifest_file)
+
+
+def save_outputs(df, embeddings):
+    """
+    Write everything to temp files first, so a crash mid-write never leaves
+    a truncated file behind, then move them into place
+    """
+    emb_tmp = tmp_path(OUTPUT_EMB_FILE)
+    mapping_tmp = tmp_path(OUTPUT_MAPPING_FILE)
+
+    # Save embeddings
+    save_embeddings(emb_tmp, embeddings, EMBEDDINGS_DTYPE)
+
+    # Save mapping file (to preserve index + text)
+    df[["original_index", "Role", "Skill", "text_hash"]].to_csv(
+        mapping_tmp,
+        index=False
+    )
+
+    replace_outputs(emb_tmp, mapping_tmp)
+
+
+# ==========================================
+# STREAMING BUILD
+# ==========================================
+
+def read_chunks(path):
+    """
+    Cleaned CSV chunks with original_index, text and text_hash columns
+    """
+    for chunk in pd.read_csv(path, chunksize=STREAM_CHUNK_ROWS):
+        check_columns(chunk)
+        chunk["original_index"] = chunk.index   # index continues across chunks
+        chunk = clean_skills(chunk)
+        chunk["text"] = build_texts(chunk)
+        chunk["text_hash"] = [text_hash(t) for t in chunk["text"]]
+        yield chunk
+
+
+def write_mapping_stream(path):
+    """
+    First pass: write the mapping CSV and count rows, without encoding
+    """
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for i, chunk in enumerate(read_chunks(INPUT_CSV)):
+            chunk[["original_index", "Role", "Skill", "text_hash"]].to_csv(
+                f, index=False, header=(i == 0)
+            )
+            rows += len(chunk)
+    return rows
+
+
+def save_json_atomic(path, data):
+    tmp = tmp_path(path)
+    Path(tmp).write_text(json.dumps(data, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# Per-process state of stream workers (set by init_stream_worker)
+worker_state = {}
+
+
+def init_stream_worker(backend, model_name, threads):
+    worker_state["model"] = load_encoder(backend, model_name, threads=threads)
+
+
+def worker_dimension():
+    return worker_state["model"].dimension
+
+
+def encode_chunk(chunk_id, start, texts, batch_size, out_path):
+    """
+    Encode one chunk and write it straight into the shared output file.
+    Returns (chunk_id, encode stats).
+    """
+    # The output is only created once a worker has reported the dimension
+    if "out" not in worker_state:
+        worker_state["out"] = np.load(out_path, mmap_mode="r+")
+    out = worker_state["out"]
+    vectors, stats = encode_texts(worker_state["model"], texts, batch_size=batch_size)
+    out[start:start + len(texts)] = vectors
+    out.flush()
+    return chunk_id, stats
+
+
+def stream_embeddings(emb_tmp, rows):
+    """
+    Fill emb_tmp (a float32 .npy, sized here) chunk by chunk across worker
+    processes, resuming from CHECKPOINT_FILE when it matches this run.
+
+    Workers are spawned rather than forked, and the parent never loads the
+    encoder: the vector size comes from the first worker.
+    """
+    # Split the cores between workers instead of oversubscribing them
+    threads = max(1, (os.cpu_count() or 1) // STREAM_WORKERS)
+    pool_start = time.perf_counter()
+
+    with ProcessPoolExecutor(
+        max_workers=STREAM_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_stream_worker,
+        initargs=(ENCODER_BACKEND, MODEL_NAME, threads)
+    ) as pool:
+        dim = pool.submit(worker_dimension).result()
+        stats = fill_stream_output(pool, emb_tmp, rows, dim)
+
+    # Throughput of the pool as a whole, not the sum of worker times
+    if stats:
+        stats["seconds"] = time.perf_counter() - pool_start
+    report_encode_stats(stats)
+
+
+def fill_stream_output(pool, emb_tmp, rows, dim):
+    """
+    Submit every chunk not done yet to the pool; returns the merged encode stats
+    """
+    input_stat = Path(INPUT_CSV).stat()
+    run = {
+        "input": str(INPUT_CSV),
+        "input_size": input_stat.st_size,
+        "input_mtime_ns": input_stat.st_mtime_ns,
+        "rows": rows,
+        "dim": dim,
+        "chunk_rows": STREAM_CHUNK_ROWS,
+        "model": MODEL_NAME,
+        "backend": ENCODER_BACKEND,
+    }
+
+    done = set()
+    stats = {}
+    checkpoint_path = Path(CHECKPOINT_FILE)
+    if checkpoint_path.exists() and Path(emb_tmp).exists():
+        checkpoint = json.loads(checkpoint_path.read_text(encoding="utf-8"))
+        if checkpoint.get("run") == run:
+            done = set(checkpoint["done"])
+            print(f"Resuming: {len(done)} chunks already encoded")
+
+    if not done:
+        # Pre-size the output; pages are only materialized as they are written
+        np.lib.format.open_memmap(emb_tmp, mode="w+", dtype=np.float32, shape=(rows, dim)).flush()
+
+    def checkpoint():
+        save_json_atomic(CHECKPOINT_FILE, {"run": run, "done": sorted(done)})
+
+    checkpoint()
+
+    total_chunks = -(-rows // STREAM_CHUNK_ROWS)
+    pending = set()
+
+    def collect(block):
+        finished, still_pending = wait(
+            pending, return_when=FIRST_COMPLETED if block else ALL_COMPLETED
+        )
+        errors = [f.exception() for f in finished if f.exception()]
+        for future in finished:
+            if not future.exception():
+                chunk_id, chunk_stats = future.result()
+                done.add(chunk_id)
+                merge_stats(stats, chunk_stats)
+        # Record finished chunks even if one failed, so a rerun skips them
+        checkpoint()
+        if errors:
+            raise errors[0]
+        print(f"  {len(done)}/{total_chunks} chunks encoded")
+        return still_pending
+
+    for chunk_id, chunk in enumerate(read_chunks(INPUT_CSV)):
+        if chunk_id in done:
+            continue
+        # Bound the texts held in memory by chunks in flight
+        if len(pending) >= 2 * STREAM_WORKERS:
+            pending = collect(block=True)
+        start = chunk_id * STREAM_CHUNK_ROWS
+        pending.add(pool.submit(
+            encode_chunk, chunk_id, start, chunk["text"].tolist(), ENCODE_BATCH_SIZE,
+            str(emb_tmp)
+        ))
+
+    if pending:
+        collect(block=False)
+
+    if len(done) != total_chunks:
+        raise RuntimeError(f"Only {len(done)} of {total_chunks} chunks were encoded")
+    return stats
+
+
+def convert_storage(src, dst, dtype, block_rows=STREAM_CHUNK_ROWS):
+    """
+    Re-encode a float32 .npy into the storage dtype block by block
+    """
+    source = np.load(src, mmap_mode="r")
+    data = np.lib.format.open_memmap(dst, mode="w+", dtype=np.dtype(dtype), shape=source.shape)
+    scales = None
+    if dtype == "int8":
+        scales = np.lib.format.open_memmap(
+            scales_path(dst), mode="w+", dtype=np.float32, shape=(len(source),)
+        )
+
+    for start in range(0, len(source), block_rows):
+        end = min(start + block_rows, len(source))
+        block = StoredVectors.from_float32(source[start:end], dtype)
+        data[start:end] = block.data
+        if scales is not None:
+            scales[start:end] = block.scales
+
+    data.flush()
+    if scales is not None:
+        scales.flush()
+
+
+def build_clusters():
+    cluster_file = clusters_path(OUTPUT_EMB_FILE)
+    vectors_file = representatives_path(OUTPUT_EMB_FILE)
+    if not COLLAPSE_NEAR_DUPLICATES:
+        # Stale files would no longer match the new embeddings
+        for path in (cluster_file, vectors_file, scales_path(vectors_file)):
+            if path.exists():
+                os.remove(path)
+        return
+
+    print(f"Collapsing near-duplicate rows (threshold {DEDUP_THRESHOLD})...")
+    table = RoleSkillTable.from_csv(OUTPUT_MAPPING_FILE)
+    clusters = write_clusters(
+        load_embeddings(OUTPUT_EMB_FILE), table.row_role_ids, cluster_file, vectors_file,
+        DEDUP_THRESHOLD
+    )
+    print(f"Clusters saved to: {cluster_file} ({clusters.rows} rows -> {len(clusters)} vectors)")
+
+
+def publish_bundle():
+    print("Building serving bundle...")
+    target = build_bundle(
+        embeddings_file=OUTPUT_EMB_FILE,
+        mapping_file=OUTPUT_MAPPING_FILE,
+        bundle_dir=SERVING_BUNDLE_DIR,
+        model_name=MODEL_NAME
+    )
+    print(f"Serving bundle: {target}")
+
+
+def main_stream():
+    emb_tmp = Path(OUTPUT_EMB_FILE).with_name(Path(OUTPUT_EMB_FILE).stem + ".partial.npy")
+    mapping_tmp = tmp_path(OUTPUT_MAPPING_FILE)
+
+    print("Writing mapping...")
+    rows = write_mapping_stream(mapping_tmp)
+    print(f"Rows: {rows}")
+
+    print(f"Generating embeddings with {STREAM_WORKERS} worker processes...")
+    stream_embeddings(emb_tmp, rows)
+
+    if EMBEDDINGS_DTYPE == "float32":
+        replace_outputs(emb_tmp, mapping_tmp)
+    else:
+        converted = tmp_path(OUTPUT_EMB_FILE)
+        convert_storage(emb_tmp, converted, EMBEDDINGS_DTYPE)
+        replace_outputs(converted, mapping_tmp)
+        os.remove(emb_tmp)
+    os.remove(CHECKPOINT_FILE)
+
+    print("Done ✅")
+    print(f"Embeddings saved to: {OUTPUT_EMB_FILE} ({EMBEDDINGS_DTYPE})")
+    print(f"Mapping saved to: {OUTPUT_MAPPING_FILE}")
+
+    build_clusters()
+    if BUILD_SERVING_BUNDLE:
+        publish_bundle()
+
+
+def main():
+    if BUILD_MODE == "stream":
+        return main_stream()
+
+    df = clean_skills(load_mapping_csv(INPUT_CSV))
+    texts = build_texts(df)
+    df["text_hash"] = [text_hash(t) for t in texts]
+
+    print(f"Loading MiniLM v2 model ({ENCODER_BACKEND})...")
+    model = load_encoder(ENCODER_BACKEND, MODEL_NAME)
+
+    print("Generating embeddings...")
+    embeddings = generate_embeddings(model, texts, df["text_hash"].tolist())
+
+    print("Embeddings shape:", embeddings.shape)
+
+    save_outputs(df, embeddings)
+
+    print("Done ✅")
+    print(f"Embeddings saved to: {OUTPUT_EMB_FILE} ({EMBEDDINGS_DTYPE})")
+    print(f"Mapping saved to: {OUTPUT_MAPPING_FILE}")
+
+    build_clusters()
+    if BUILD_SERVING_BUNDLE:
+        publish_bundle()
+
+    if REPORT_STORAGE_FORMATS:
+        print("\nStorage format trade-off (vs float32 exact search):")
+        for row in compare_storage_formats(embeddings):
+            print(
+                f"  {row['dtype']:>8}: {row['megabytes']:8.2f} MB  "
+                f"recall@5 {row['recall@5']:.3f}  "
+                f"{row['ms_per_query']:.3f} ms/query"
+            )
 
-# Save mapping file (to preserve index + text)
-df[["original_index", "Role", "Skill"]].to_csv(
-    OUTPUT_MAPPING_FILE,
-    index=False
-)
 
-print("Done ✅")
-print(f"Embeddings saved to: {OUTPUT_EMB_FILE}")
-print(f"Mapping saved to: {OUTPUT_MAPPING_FILE}")
+if __name__ == "__main__":
+    main()
 
 
 
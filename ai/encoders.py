@@ -0,0 +1,204 @@
+# ==========================================
+# encoders.py
+# Sentence encoder backends behind one interface
+# ==========================================
+#
+# Every backend runs sentence-transformers/all-MiniLM-L6-v2 on CPU and
+# returns L2-normalized float32 vectors, so they are interchangeable for
+# server.py, embeddings.py and cosinesimilarity.py:
+#
+#   torch      : default PyTorch path, optionally with a fixed thread count
+#   onnx       : ONNX Runtime export of the model
+#   onnx-int8  : ONNX Runtime, dynamically int8-quantized weights
+#   hash       : deterministic stand-in (hashed bag of words), no model
+#                download - for benchmarks and offline runs only, its
+#                vectors are not comparable with MiniLM ones
+#
+# The onnx backends need sentence-transformers >= 3.2 with its ONNX extra
+# (pip install "sentence-transformers[onnx]"); torch needs nothing extra.
+#
+# Check that a backend retrieves the same roles as the torch reference:
+#   python encoders.py --backend onnx-int8
+
+import os
+import re
+import time
+import zlib
+
+import numpy as np
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+ENCODER_BACKENDS = ("torch", "onnx", "onnx-int8", "hash")
+
+# Vector size of the hash backend (same as MiniLM)
+HASH_DIMENSION = 384
+
+# Quantized graph shipped in the model repo (avx2 kernels run on any x86-64
+# server; the avx512 / avx512_vnni variants are faster where supported)
+ONNX_INT8_FILE = os.environ.get("ENCODER_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+
+
+class SentenceEncoder:
+
+    def __init__(self, model, backend):
+        self.model = model
+        self.backend = backend
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def max_seq_length(self):
+        return self.model.max_seq_length
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        """
+        (len(texts), dim) normalized float32 embeddings
+        """
+        vectors = self.model.encode(
+            list(texts),
+            batch_size=batch_size,
+            show_progress_bar=show_progress_bar,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class HashEncoder:
+    """
+    Stand-in with the SentenceEncoder interface: every token adds +-1 to a
+    crc32-chosen dimension, then the vector is L2-normalized. Texts sharing
+    words get similar vectors, and results are identical on every machine.
+    """
+
+    backend = "hash"
+    max_seq_length = 256
+    token_pattern = re.compile(r"[a-z0-9+#.]+")
+
+    def __init__(self, dimension=HASH_DIMENSION):
+        self.dimension = dimension
+
+    def tokens(self, text):
+        return self.token_pattern.findall(str(text).lower())[:self.max_seq_length]
+
+    def tokenizer(self, texts, add_special_tokens=True, truncation=True, max_length=None):
+        # Just enough of the HF tokenizer call for embeddings.token_lengths
+        special = 2 if add_special_tokens else 0
+        return {"input_ids": [[0] * (len(self.tokens(t)) + special) for t in texts]}
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in self.tokens(text):
+                h = zlib.crc32(token.encode("utf-8"))
+                vectors[row, h % self.dimension] += 1.0 if h & 1 << 31 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+def load_encoder(backend="torch", model_name=MODEL_NAME, threads=None):
+    """
+    threads: intra-op thread count (torch.set_num_threads / ORT session),
+    None keeps the library default (all cores)
+    """
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(
+            f"Unknown encoder backend '{backend}', expected one of {ENCODER_BACKENDS}"
+        )
+
+    if backend == "hash":
+        return HashEncoder()
+
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        model = SentenceTransformer(model_name, device="cpu")
+        return SentenceEncoder(model, backend)
+
+    model_kwargs = {"provider": "CPUExecutionProvider"}
+    if backend == "onnx-int8":
+        model_kwargs["file_name"] = ONNX_INT8_FILE
+    if threads:
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        model_kwargs["session_options"] = options
+
+    model = SentenceTransformer(
+        model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs
+    )
+    return SentenceEncoder(model, backend)
+
+
+def compare_backends(candidate, reference, queries, index, k=5):
+    """
+    How closely `candidate` reproduces `reference` retrieval on `queries`:
+    identical top-1 role, overlap of the top-k sets, cosine between the
+    two query vectors, and encode time per query for each.
+    """
+    from retrieval import topk_overlap
+
+    timings = {}
+    vectors = {}
+    for name, encoder in (("reference", reference), ("candidate", candidate)):
+        start = time.perf_counter()
+        vectors[name] = encoder.encode(queries)
+        timings[name] = 1000 * (time.perf_counter() - start) / len(queries)
+
+    _, ref_top = index.search(vectors["reference"], k)
+    _, cand_top = index.search(vectors["candidate"], k)
+
+    return {
+        "queries": len(queries),
+        "top1_agreement": float(np.mean(ref_top[:, 0] == cand_top[:, 0])),
+        f"top{k}_overlap": topk_overlap(cand_top, ref_top),
+        "mean_cosine": float(np.mean(np.sum(vectors["reference"] * vectors["candidate"], axis=1))),
+        "reference_ms_per_query": timings["reference"],
+        "candidate_ms_per_query": timings["candidate"],
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    from pathlib import Path
+
+    import pandas as pd
+
+    from retrieval import ExactIndex, load_embeddings
+
+    base_dir = Path(__file__).resolve().parent
+
+    parser = argparse.ArgumentParser(description="Check an encoder backend against torch")
+    parser.add_argument("--backend", default="onnx-int8", choices=ENCODER_BACKENDS)
+    parser.add_argument("--reference", default="torch", choices=ENCODER_BACKENDS)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--embeddings", default=str(base_dir / "role_skill_embeddings.npy"))
+    parser.add_argument("--mapping", default=str(base_dir / "embedding_index_mapping.csv"))
+    parser.add_argument("--min-top1", type=float, default=0.95,
+                        help="exit non-zero below this top-1 agreement")
+    args = parser.parse_args()
+
+    # Skill lists from the mapping double as realistic queries
+    queries = pd.read_csv(args.mapping)["Skill"].astype(str).str.lower().tolist()
+    index = ExactIndex(load_embeddings(args.embeddings))
+
+    report = compare_backends(
+        load_encoder(args.backend, threads=args.threads),
+        load_encoder(args.reference, threads=args.threads),
+        queries,
+        index
+    )
+    for key, value in report.items():
+        print(f"{key:>24}: {value:.4f}" if isinstance(value, float) else f"{key:>24}: {value}")
+
+    raise SystemExit(0 if report["top1_agreement"] >= args.min_top1 else 1)
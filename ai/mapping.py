@@ -0,0 +1,121 @@
+# ==========================================
+# mapping.py
+# Role/skill mapping pre-parsed into flat arrays
+# ==========================================
+#
+# embedding_index_mapping.csv row i describes embedding row i as a role name
+# plus a comma-separated skill string. Parsing that per hit (pandas .iloc,
+# split, lower) is pure overhead, so it is done once here:
+#
+#   role_names[row_role_ids[i]]                          -> role of row i
+#   skill_vocab[skill_ids[skill_indptr[i]:skill_indptr[i + 1]]]
+#                                                        -> skills of row i
+#
+# Skills are interned (lower-cased, stripped) so per-skill data such as risk
+# scores can live in arrays indexed by skill ID.
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# File names used by save_arrays / load_arrays (one .npy each)
+TABLE_ARRAYS = ("role_names", "row_role_ids", "skill_vocab", "skill_indptr", "skill_ids")
+
+
+def split_skills(skills):
+    return [s.strip().lower() for s in str(skills).split(",")]
+
+
+class RoleSkillTable:
+
+    def __init__(self, role_names, row_role_ids, skill_vocab, skill_indptr, skill_ids):
+        self.role_names = role_names
+        self.row_role_ids = row_role_ids
+        self.skill_vocab = skill_vocab
+        self.skill_indptr = skill_indptr
+        self.skill_ids = skill_ids
+        self.skill_index = {skill: i for i, skill in enumerate(skill_vocab)}
+
+    @classmethod
+    def from_frame(cls, df):
+        role_index, role_names = {}, []
+        skill_index, skill_vocab = {}, []
+        row_role_ids, skill_ids, skill_indptr = [], [], [0]
+
+        for role, skills in zip(df["Role"], df["Skill"]):
+            role = str(role)
+            if role not in role_index:
+                role_index[role] = len(role_names)
+                role_names.append(role)
+            row_role_ids.append(role_index[role])
+
+            for skill in split_skills(skills):
+                if skill not in skill_index:
+                    skill_index[skill] = len(skill_vocab)
+                    skill_vocab.append(skill)
+                skill_ids.append(skill_index[skill])
+            skill_indptr.append(len(skill_ids))
+
+        return cls(
+            role_names,
+            np.asarray(row_role_ids, dtype=np.int32),
+            skill_vocab,
+            np.asarray(skill_indptr, dtype=np.int64),
+            np.asarray(skill_ids, dtype=np.int32),
+        )
+
+    @classmethod
+    def from_csv(cls, path):
+        return cls.from_frame(pd.read_csv(path))
+
+    def save_arrays(self, directory):
+        """
+        One .npy per array; names are stored as fixed-width unicode so no
+        file needs pickle
+        """
+        paths = {}
+        for name in TABLE_ARRAYS:
+            paths[name] = Path(directory) / f"{name}.npy"
+            np.save(paths[name], np.asarray(getattr(self, name)), allow_pickle=False)
+        return paths
+
+    @classmethod
+    def load_arrays(cls, directory, mmap=True):
+        """
+        Inverse of save_arrays. The row-sized arrays stay memory-mapped; the
+        (small) name vocabularies become Python lists for dict lookups.
+        """
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(Path(directory) / f"{name}.npy", mmap_mode=mmap_mode)
+            for name in TABLE_ARRAYS
+        }
+        return cls(
+            arrays["role_names"].tolist(),
+            arrays["row_role_ids"],
+            arrays["skill_vocab"].tolist(),
+            arrays["skill_indptr"],
+            arrays["skill_ids"],
+        )
+
+    def __len__(self):
+        return len(self.row_role_ids)
+
+    def role(self, row):
+        return self.role_names[self.row_role_ids[row]]
+
+    def row_skill_ids(self, row):
+        return self.skill_ids[self.skill_indptr[row]:self.skill_indptr[row + 1]]
+
+    def skills(self, row):
+        return [self.skill_vocab[i] for i in self.row_skill_ids(row)]
+
+    def skill_values(self, lookup, default=np.nan):
+        """
+        Array over the skill vocabulary of lookup.get(skill, default)
+        """
+        return np.array(
+            [lookup.get(skill, default) for skill in self.skill_vocab],
+            dtype=np.float64
+        )
@@ -0,0 +1,466 @@
+# ==========================================
+# retrieval.py
+# Nearest-neighbour search over role/skill embeddings
+# ==========================================
+#
+# All vectors are L2-normalized by embeddings.py (and queries by the
+# encoder), so cosine similarity is a plain dot product.
+#
+#   exact : dot product against every row + partial top-k selection
+#   ivf   : inverted file index - spherical k-means clusters the rows into
+#           `nlist` lists, a query only scans the `nprobe` closest lists
+#
+# The matrix can be stored as float32, float16 or int8 (one float32 scale
+# per row) and is opened with mmap so all server workers share a single
+# page-cache copy.
+#
+# A build manifest (<stem>.build.json) next to the matrix records the
+# size and sha256 of the matrix, its scales and its mapping CSV, so a set
+# mixed from two builds is refused instead of served.
+
+import hashlib
+import json
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+
+# ==========================================
+# STORAGE FORMATS
+# ==========================================
+
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+# Rows converted to float32 at a time when scoring float16 / int8 storage
+SCORE_BLOCK_ROWS = 65536
+
+
+def scales_path(path):
+    """
+    Sidecar file holding the per-row scales of an int8 matrix
+    """
+    path = Path(path)
+    return path.with_name(path.stem + ".scales.npy")
+
+
+def quantize_int8(vectors):
+    """
+    Symmetric per-row scalar quantization: row ~= codes * scale
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class StoredVectors:
+    """
+    Embedding matrix in its storage dtype. Scores are computed block by
+    block so a float16 / int8 matrix is never expanded to float32 in full.
+    """
+
+    def __init__(self, data, scales=None):
+        self.data = np.asarray(data)   # plain ndarray view, no copy of a memmap
+        self.scales = None if scales is None else np.asarray(scales, dtype=np.float32)
+
+    @classmethod
+    def from_float32(cls, vectors, dtype="float32"):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown storage dtype '{dtype}', expected one of {STORAGE_DTYPES}")
+        if dtype == "int8":
+            return cls(*quantize_int8(vectors))
+        return cls(np.asarray(vectors, dtype=dtype))
+
+    @property
+    def dtype(self):
+        return str(self.data.dtype)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def rows(self, idx):
+        """
+        float32 copy of the selected rows
+        """
+        block = self.data[idx].astype(np.float32)
+        if self.scales is not None:
+            block *= self.scales[idx][..., None]
+        return block
+
+    def subset(self, idx):
+        return StoredVectors(
+            self.data[idx], None if self.scales is None else self.scales[idx]
+        )
+
+    def dot(self, queries):
+        """
+        (n_queries, n_rows) float32 similarity matrix
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.data.dtype == np.float32:
+            return queries @ self.data.T
+
+        out = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, len(self))
+            block = self.data[start:end].astype(np.float32)
+            out[:, start:end] = queries @ block.T
+            if self.scales is not None:
+                # (q . codes) * scale == q . (codes * scale)
+                out[:, start:end] *= self.scales[start:end]
+        return out
+
+
+# ==========================================
+# BUILD MANIFEST
+# ==========================================
+
+def sha256_file(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_manifest_path(path):
+    """
+    Build manifest stored next to an embeddings .npy
+    """
+    path = Path(path)
+    return path.with_name(path.stem + ".build.json")
+
+
+def output_files(embeddings_file, mapping_file):
+    files = {"embeddings": Path(embeddings_file), "mapping": Path(mapping_file)}
+    if np.load(embeddings_file, mmap_mode="r").dtype == np.int8:
+        files["scales"] = scales_path(embeddings_file)
+    return files
+
+
+def write_build_manifest(embeddings_file, mapping_file, path, **details):
+    """
+    Record the files of one build (details: model, backend, ...) in `path`
+    """
+    manifest = {
+        "build_id": uuid.uuid4().hex,
+        "created_utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "rows": len(np.load(embeddings_file, mmap_mode="r")),
+        **details,
+        "files": {
+            role: {"bytes": file.stat().st_size, "sha256": sha256_file(file)}
+            for role, file in output_files(embeddings_file, mapping_file).items()
+        },
+    }
+    Path(path).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def check_build_manifest(embeddings_file, mapping_file):
+    """
+    The build manifest of embeddings_file, after checking that it and
+    mapping_file are the files it records (ValueError if not). None for
+    outputs written before build manifests existed.
+    """
+    path = build_manifest_path(embeddings_file)
+    if not path.exists():
+        return None
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    files = output_files(embeddings_file, mapping_file)
+    if set(files) != set(manifest["files"]):
+        raise ValueError(f"{embeddings_file} does not match the storage recorded in {path}")
+    for role, file in files.items():
+        expected = manifest["files"][role]
+        if file.stat().st_size != expected["bytes"] or sha256_file(file) != expected["sha256"]:
+            raise ValueError(f"{file} is not the file of build {manifest['build_id']} ({path})")
+    return manifest
+
+
+def as_stored(vectors):
+    return vectors if isinstance(vectors, StoredVectors) else StoredVectors(vectors)
+
+
+def save_embeddings(path, vectors, dtype="float32"):
+    """
+    Write a normalized float32 matrix to `path` in the given storage dtype
+    """
+    stored = StoredVectors.from_float32(vectors, dtype)
+    save_stored(path, stored)
+    return stored
+
+
+def save_stored(path, stored):
+    """
+    Write StoredVectors as they are (no re-quantization), for load_embeddings
+    """
+    np.save(path, stored.data)
+    if stored.scales is not None:
+        np.save(scales_path(path), stored.scales)
+
+
+def load_embeddings(path, mmap=True):
+    """
+    Open a matrix written by save_embeddings (or a plain float32 .npy).
+    The storage dtype is read from the file itself.
+    """
+    mmap_mode = "r" if mmap else None
+    data = np.load(path, mmap_mode=mmap_mode)
+    scales = None
+    if data.dtype == np.int8:
+        scales = np.load(scales_path(path), mmap_mode=mmap_mode)
+        if len(scales) != len(data):
+            raise ValueError(
+                f"{scales_path(path)} has {len(scales)} rows but {path} has {len(data)}"
+            )
+    return StoredVectors(data, scales)
+
+
+def top_k(scores, k):
+    """
+    Top-k (values, indices) per row of a 2-D score matrix, best first.
+    Uses argpartition so only the k winners get sorted.
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty, empty.astype(np.int64)
+
+    if k < scores.shape[1]:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return (
+        np.take_along_axis(part_scores, order, axis=1),
+        np.take_along_axis(part, order, axis=1),
+    )
+
+
+# ==========================================
+# EXACT
+# ==========================================
+
+class ExactIndex:
+    mode = "exact"
+
+    def __init__(self, vectors):
+        self.vectors = as_stored(vectors)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, queries, k):
+        """
+        queries: (n_queries, dim) normalized vectors
+        returns (scores, indices), both (n_queries, k)
+        """
+        return top_k(self.vectors.dot(queries), k)
+
+    def describe(self):
+        return {"mode": self.mode, "size": len(self), "storage": self.vectors.dtype}
+
+
+# ==========================================
+# IVF (approximate)
+# ==========================================
+
+def spherical_kmeans(vectors, n_clusters, n_iter=20, seed=0):
+    """
+    k-means on the unit sphere (assignment by dot product).
+    Returns (centroids, assignments).
+    """
+    rng = np.random.default_rng(seed)
+    n = vectors.shape[0]
+    centroids = vectors[rng.choice(n, n_clusters, replace=False)].copy()
+
+    assign = None
+    for _ in range(n_iter):
+        new_assign = np.argmax(vectors @ centroids.T, axis=1)
+        if assign is not None and np.array_equal(new_assign, assign):
+            break
+        assign = new_assign
+
+        for c in range(n_clusters):
+            members = vectors[assign == c]
+            if len(members) == 0:
+                # Reseed empty clusters on a random row
+                centroids[c] = vectors[rng.integers(n)]
+                continue
+            centroid = members.sum(axis=0)
+            norm = np.linalg.norm(centroid)
+            centroids[c] = centroid / norm if norm > 0 else members[0]
+
+    return centroids, assign
+
+
+class IVFIndex:
+    mode = "ivf"
+
+    def __init__(self, vectors, nlist=None, nprobe=4, n_iter=20, seed=0,
+                 train_size=65536):
+        vectors = as_stored(vectors)
+        n = len(vectors)
+
+        # sqrt(n) lists is the usual starting point
+        self.nlist = max(1, min(n, nlist or int(np.sqrt(n))))
+        self.nprobe = max(1, min(self.nlist, nprobe))
+        self.size = n
+
+        # Train centroids on a sample, then assign every row
+        rng = np.random.default_rng(seed)
+        train_rows = np.sort(rng.choice(n, min(n, train_size), replace=False))
+        self.centroids, _ = spherical_kmeans(
+            vectors.rows(train_rows), self.nlist, n_iter=n_iter, seed=seed
+        )
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, SCORE_BLOCK_ROWS):
+            end = min(start + SCORE_BLOCK_ROWS, n)
+            assign[start:end] = np.argmax(
+                self.centroids @ vectors.rows(slice(start, end)).T, axis=0
+            )
+
+        # Row ids grouped by list; probes gather their rows from the shared
+        # (memory-mapped) matrix instead of a private list-ordered copy
+        order = np.argsort(assign, kind="stable")
+        self.list_ids = order.astype(np.int64)
+        self.vectors = vectors
+        counts = np.bincount(assign, minlength=self.nlist)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def __len__(self):
+        return self.size
+
+    def _candidates(self, centroid_scores, k):
+        """
+        Row positions (in list order) covered by the closest lists, probing
+        past nprobe when those lists hold fewer than k rows.
+        """
+        ranked = np.argsort(-centroid_scores)
+        slices, total = [], 0
+        for probed, c in enumerate(ranked):
+            if probed >= self.nprobe and total >= k:
+                break
+            start, end = self.list_offsets[c], self.list_offsets[c + 1]
+            if end > start:
+                slices.append(np.arange(start, end))
+                total += end - start
+        return np.concatenate(slices)
+
+    def search(self, queries, k):
+        queries = np.asarray(queries, dtype=np.float32)
+        k = min(k, self.size)
+        all_scores = np.empty((len(queries), k), dtype=np.float32)
+        all_indices = np.empty((len(queries), k), dtype=np.int64)
+
+        centroid_scores = queries @ self.centroids.T
+
+        for i, query in enumerate(queries):
+            rows = self.list_ids[self._candidates(centroid_scores[i], k)]
+            scores = self.vectors.subset(rows).dot(query[None, :])
+            top_scores, top_pos = top_k(scores, k)
+            all_scores[i] = top_scores[0]
+            all_indices[i] = rows[top_pos[0]]
+
+        return all_scores, all_indices
+
+    def describe(self):
+        return {
+            "mode": self.mode,
+            "size": len(self),
+            "storage": self.vectors.dtype,
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+        }
+
+
+# ==========================================
+# FACTORY + EVALUATION
+# ==========================================
+
+INDEX_TYPES = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+}
+
+
+def build_index(vectors, mode="exact", **params):
+    if mode not in INDEX_TYPES:
+        raise ValueError(
+            f"Unknown retrieval mode '{mode}', expected one of {sorted(INDEX_TYPES)}"
+        )
+    return INDEX_TYPES[mode](vectors, **params)
+
+
+def recall_at_k(index, reference, queries, k):
+    """
+    Fraction of the reference (exact) top-k neighbours that `index` returns
+    """
+    _, found = index.search(queries, k)
+    _, expected = reference.search(queries, k)
+    return topk_overlap(found, expected)
+
+
+def topk_overlap(found, expected):
+    """
+    Mean fraction of each expected top-k row that also appears in found
+    """
+    hits = sum(
+        len(set(f.tolist()) & set(e.tolist())) for f, e in zip(found, expected)
+    )
+    return hits / expected.size if expected.size else 1.0
+
+
+def sample_queries(vectors, n=256, noise=0.3, seed=0):
+    """
+    Evaluation queries: stored rows nudged off their exact position, so a
+    row is not trivially its own nearest neighbour
+    """
+    vectors = as_stored(vectors)
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(vectors), min(n, len(vectors)), replace=False))
+    queries = vectors.rows(rows)
+    # noise is relative to the (unit) vector norm
+    scale = noise / np.sqrt(queries.shape[1])
+    queries = queries + scale * rng.standard_normal(queries.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def compare_storage_formats(vectors, k=5, n_queries=256, repeats=5):
+    """
+    Accuracy / latency of each storage dtype against float32 exact search.
+    Returns one dict per dtype: size on disk, recall@k and ms per query.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    queries = sample_queries(vectors, n=n_queries)
+    reference = ExactIndex(vectors)
+
+    report = []
+    for dtype in STORAGE_DTYPES:
+        index = ExactIndex(StoredVectors.from_float32(vectors, dtype))
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for query in queries:
+                index.search(query[None, :], k)
+        elapsed = time.perf_counter() - start
+
+        report.append({
+            "dtype": dtype,
+            "megabytes": index.vectors.nbytes / 1e6,
+            f"recall@{k}": recall_at_k(index, reference, queries, k),
+            "ms_per_query": 1000 * elapsed / (repeats * len(queries)),
+        })
+    return report
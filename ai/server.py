@@ -3,14 +3,33 @@
 # Intelligent Career Risk System Backend
 # ==========================================
 
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
 import numpy as np
-import pandas as pd
-import joblib
-from fastapi import FastAPI
+from typing import List
+
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+
+from batching import MicroBatcher
+from bundle import current_bundle_path, open_bundle, published_ns
+from dedup import ClusteredIndex, NearDuplicateClusters, clusters_path, representatives_path
+from encoders import load_encoder
+from mapping import RoleSkillTable
+from metrics import CONTENT_TYPE, Registry
+from retrieval import (
+    ExactIndex, build_index, check_build_manifest, load_embeddings, recall_at_k,
+    sample_queries
+)
+from skill_bypass import SkillOverlapIndex, SkillVectorCache
+from skill_risk import load_and_score
 
 # ==========================================
 # CONFIG
@@ -19,45 +38,325 @@ from sklearn.metrics.pairwise import cosine_similarity
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
-EMBEDDINGS_FILE = BASE_DIR / "role_skill_embeddings.npy"
+# Directory holding the artifacts below (benchmark.py points it at
+# synthetic ones)
+ARTIFACTS_DIR = Path(os.environ.get("AI_ARTIFACTS_DIR", BASE_DIR))
+# float32, float16 or int8 (+ .scales.npy) - see embeddings.py
+EMBEDDINGS_FILE = ARTIFACTS_DIR / "role_skill_embeddings.npy"
+MAPPING_FILE = ARTIFACTS_DIR / "embedding_index_mapping.csv"
+ENGINEERED_FEATURES_FILE = ARTIFACTS_DIR / "engineered_features.csv"
+MODEL_FILE = ARTIFACTS_DIR / "skill_decline_risk_model.pkl"
+SCALER_FILE = ARTIFACTS_DIR / "skill_scaler.pkl"
 
-embeddings = np.load(EMBEDDINGS_FILE)
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+TOP_K = 5
 
+# Encoder runtime: "torch", "onnx", "onnx-int8" or "hash" (see encoders.py)
+ENCODER_BACKEND = os.environ.get("ENCODER_BACKEND", "torch")
+ENCODER_THREADS = int(os.environ.get("ENCODER_THREADS", "0")) or None
+
+# Role retrieval engine: "exact" (full dot product) or "ivf" (approximate)
+RETRIEVAL_MODE = os.environ.get("RETRIEVAL_MODE", "exact")
+IVF_NLIST = int(os.environ.get("IVF_NLIST", "0")) or None   # default sqrt(rows)
+IVF_NPROBE = int(os.environ.get("IVF_NPROBE", "4"))
+
+# Max number of query embeddings kept in the LRU cache (0 disables it)
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "4096"))
+
+# Concurrent /analyze requests are encoded + searched together: a batch is
+# flushed after BATCH_MAX_WAIT_MS or once BATCH_MAX_SIZE queries are queued
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "5"))
+
+# /analyze/batch encodes and searches this many profiles at a time
+ANALYZE_BATCH_CHUNK = int(os.environ.get("ANALYZE_BATCH_CHUNK", "256"))
+
+# Files the risk scores and /market-trends payload are derived from
+RISK_ARTIFACT_FILES = (ENGINEERED_FEATURES_FILE, MODEL_FILE, SCALER_FILE)
+
+# A background thread reloads them this often (seconds) when they changed,
+# so /analyze picks up new scores too; /market-trends also checks on every
+# call. 0 disables the background check.
+RISK_REFRESH_SECONDS = float(os.environ.get("RISK_REFRESH_SECONDS", "10"))
+
+# Versioned serving bundle (see bundle.py). When it has a CURRENT version,
+# embeddings, mapping and risk scores all come from it and the loose files
+# above are ignored; otherwise the server falls back to them. It also falls
+# back when any loose file is newer than the bundle (rebuilt artifacts
+# without a rebuilt bundle).
+SERVING_BUNDLE_DIR = Path(os.environ.get("SERVING_BUNDLE_DIR", ARTIFACTS_DIR / "serving_bundle"))
+# "size" checks file sizes against the manifest; "sha256" hashes every file
+# (reads the whole bundle on each start); "off" skips the check
+BUNDLE_VERIFY = os.environ.get("BUNDLE_VERIFY", "size")
+
+# Search one representative per near-duplicate cluster (see dedup.py) when
+# the build produced clusters; hits are expanded to all member rows
+DEDUP_CLUSTERS = os.environ.get("DEDUP_CLUSTERS", "1") == "1"
+
+# Queries made only of skill names from the mapping skip the encoder and
+# are ranked by skill overlap, blended with cached per-skill vectors by
+# SKILL_BYPASS_VECTOR_WEIGHT (0 = overlap only) - see skill_bypass.py.
+# similarity_score stays a cosine on both paths; the score a hit was
+# ranked by is reported as match_score.
+SKILL_BYPASS = os.environ.get("SKILL_BYPASS", "1") == "1"
+SKILL_BYPASS_VECTOR_WEIGHT = float(os.environ.get("SKILL_BYPASS_VECTOR_WEIGHT", "0.5"))
 
-MAPPING_FILE = BASE_DIR / "embedding_index_mapping.csv"
-ENGINEERED_FEATURES_FILE = BASE_DIR / "engineered_features.csv"
-MODEL_FILE = BASE_DIR / "skill_decline_risk_model.pkl"
-SCALER_FILE = BASE_DIR / "skill_scaler.pkl"
+# ==========================================
+# METRICS
+# ==========================================
+#
+# Exported in Prometheus format on GET /metrics. Stages of one /analyze:
+# batch_wait (queued in the micro-batcher) -> encode (encoder, cache misses
+# only) -> search, or skill_index for encoder-free queries -> role_skills
+# -> skill_risk -> role_risk.
 
-MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
-TOP_K = 5
+metrics = Registry()
+
+STAGE_SECONDS = metrics.histogram(
+    "ai_stage_seconds", "Time spent in each analysis pipeline stage", ["stage"]
+)
+REQUEST_SECONDS = metrics.histogram(
+    "ai_request_seconds", "End-to-end latency of analysis requests", ["endpoint"]
+)
+SEARCH_BATCH_SIZE = metrics.histogram(
+    "ai_search_batch_size", "Queries per encode + search call", ["source"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+RETRIEVAL_PATH = metrics.counter(
+    "ai_retrieval_path_total", "Queries answered per retrieval path", ["path"]
+)
 
 # ==========================================
 # LOAD EVERYTHING ON STARTUP
 # ==========================================
+#
+# Artifacts load in a background thread started by the app lifespan, so the
+# process binds its port immediately. /live answers right away, /ready and
+# the model-backed routes return 503 until loading (and the encoder
+# warm-up) has finished. A failed load also fails /live, so the
+# orchestrator restarts the worker instead of waiting on it forever.
+
+WARMUP_QUERY = "python, sql"
+
+embeddings = None
+index = None
+retrieval_report = {}
+role_table = None
+embedder = None
+bundle = None
+clusters = None
+representative_vectors = None
+skill_bypass = None
+
+startup_state = {"status": "loading", "error": None}
+artifact_load_seconds = {}
+
+
+def timed_load(name, load, verb="Loading"):
+    print(f"{verb} {name}...")
+    start = time.perf_counter()
+    result = load()
+    artifact_load_seconds[name] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def load_clusters(path, vectors_path):
+    """
+    Near-duplicate clusters for the loaded embeddings and their memory-mapped
+    representative vectors, or (None, None) when disabled, missing or built
+    for a different matrix
+    """
+    if not DEDUP_CLUSTERS or not Path(path).exists() or not Path(vectors_path).exists():
+        return None, None
+    loaded = NearDuplicateClusters.load(path)
+    if loaded.rows != len(embeddings):
+        print(f"Ignoring {path}: {loaded.rows} rows, embeddings have {len(embeddings)}")
+        return None, None
+    vectors = load_embeddings(vectors_path)
+    if len(vectors) != len(loaded):
+        print(f"Ignoring {path}: {len(loaded)} clusters, {vectors_path} has {len(vectors)} vectors")
+        return None, None
+    print(f"Near-duplicate clusters: {loaded.rows} rows -> {len(loaded)} vectors")
+    return loaded, vectors
+
+
+def build_retrieval_index():
+    global retrieval_report
+
+    # Only representatives are searched when near-duplicates are collapsed
+    vectors = embeddings if clusters is None else representative_vectors
+
+    if RETRIEVAL_MODE == "ivf":
+        built = build_index(vectors, "ivf", nlist=IVF_NLIST, nprobe=IVF_NPROBE)
+    else:
+        built = build_index(vectors, RETRIEVAL_MODE)
+
+    report = built.describe()
+    if RETRIEVAL_MODE != "exact":
+        recall = recall_at_k(
+            built, ExactIndex(vectors), sample_queries(vectors), TOP_K
+        )
+        report[f"recall@{TOP_K}"] = recall
+        print(f"Retrieval recall@{TOP_K} vs exact: {recall:.3f}")
+
+    if clusters is not None:
+        built = ClusteredIndex(built, clusters)
+        report["near_duplicates"] = clusters.describe()
 
-print("Loading embeddings...")
-embeddings = np.load(EMBEDDINGS_FILE)
+    retrieval_report = report
+    return built
 
-print("Loading mapping...")
-mapping_df = pd.read_csv(MAPPING_FILE)
 
-print("Loading engineered features...")
-features_df = pd.read_csv(ENGINEERED_FEATURES_FILE)
+def encode_skill_names(names):
+    with STAGE_SECONDS.time(stage="encode"):
+        return embedder.encode(names)
 
-print("Loading risk model...")
-risk_model = joblib.load(MODEL_FILE)
-scaler = joblib.load(SCALER_FILE)
-print("Loading MiniLM model...")
-embedder = SentenceTransformer(MODEL_NAME)
 
-print("System Ready ✅")
+def build_skill_bypass():
+    skill_vectors = SkillVectorCache(
+        role_table.skill_vocab, encode_skill_names, embeddings.shape[1]
+    )
+    return SkillOverlapIndex(
+        role_table, embeddings, skill_vectors, clusters, SKILL_BYPASS_VECTOR_WEIGHT
+    )
+
+
+def warm_up():
+    """
+    First encode/search pays one-off costs (lazy init, allocations); do it
+    here instead of on a user request. Bypasses the query cache.
+    """
+    index.search(embedder.encode([WARMUP_QUERY]), TOP_K)
+
+
+def load_bundle(path):
+    global bundle, embeddings, role_table, clusters, representative_vectors
+    global risk_artifacts_signature
+
+    bundle = timed_load(f"bundle {path.name}", lambda: open_bundle(path, verify=BUNDLE_VERIFY))
+    embeddings, role_table = bundle.embeddings, bundle.role_table
+    clusters, representative_vectors = (
+        load_clusters(bundle.clusters_file, bundle.representatives_file)
+        if bundle.clusters_file else (None, None)
+    )
+    if bundle.manifest["model_name"] != MODEL_NAME:
+        print(
+            f"WARNING: bundle embeddings were built with {bundle.manifest['model_name']}, "
+            f"server encodes queries with {MODEL_NAME}"
+        )
+    install_risk_scores(bundle.risk_skills, np.asarray(bundle.risk_scores))
+
+    # Loose risk files changed from here on replace the bundle's scores
+    try:
+        risk_artifacts_signature = risk_artifact_signature()
+    except OSError:
+        risk_artifacts_signature = None
+
+
+def loose_artifact_files():
+    return (
+        EMBEDDINGS_FILE, MAPPING_FILE, *RISK_ARTIFACT_FILES,
+        clusters_path(EMBEDDINGS_FILE), representatives_path(EMBEDDINGS_FILE),
+    )
+
+
+def newer_loose_artifacts():
+    """
+    Loose artifact files modified after the live bundle was published
+    """
+    published = published_ns(SERVING_BUNDLE_DIR)
+    return [
+        path for path in map(Path, loose_artifact_files())
+        if path.exists() and path.stat().st_mtime_ns > published
+    ]
+
+
+def load_artifacts():
+    global embeddings, index, role_table, embedder, clusters, representative_vectors, skill_bypass
+
+    try:
+        bundle_path = current_bundle_path(SERVING_BUNDLE_DIR)
+        if bundle_path is not None:
+            newer = newer_loose_artifacts()
+            if newer:
+                print(
+                    f"WARNING: {', '.join(p.name for p in newer)} newer than bundle "
+                    f"{bundle_path.name}, serving the loose files (rebuild it: python bundle.py)"
+                )
+                bundle_path = None
+        if bundle_path is not None:
+            load_bundle(bundle_path)
+        else:
+            # Memory-mapped: uvicorn workers share one page-cache copy of the matrix
+            embeddings = timed_load("embeddings", lambda: load_embeddings(EMBEDDINGS_FILE))
+            role_table = timed_load("mapping", lambda: RoleSkillTable.from_csv(MAPPING_FILE))
+            if len(role_table) != len(embeddings):
+                raise ValueError(
+                    f"{MAPPING_FILE} has {len(role_table)} rows but "
+                    f"{EMBEDDINGS_FILE} has {len(embeddings)}"
+                )
+            # Loose files are hashed in full; a bundle was checked when built
+            manifest = timed_load(
+                "build manifest", lambda: check_build_manifest(EMBEDDINGS_FILE, MAPPING_FILE),
+                verb="Checking"
+            )
+            if manifest is None:
+                print("No build manifest next to the embeddings, only row counts checked")
+            clusters, representative_vectors = load_clusters(
+                clusters_path(EMBEDDINGS_FILE), representatives_path(EMBEDDINGS_FILE)
+            )
+            timed_load("risk model", load_risk_artifacts)
+        print(f"Embeddings: {embeddings.shape} stored as {embeddings.dtype}")
+
+        index = timed_load(f"{RETRIEVAL_MODE} index", build_retrieval_index)
+        embedder = timed_load(
+            f"MiniLM model ({ENCODER_BACKEND})",
+            lambda: load_encoder(ENCODER_BACKEND, MODEL_NAME, threads=ENCODER_THREADS)
+        )
+        if SKILL_BYPASS:
+            skill_bypass = timed_load("skill index", build_skill_bypass, verb="Building")
+        timed_load("warm-up", warm_up, verb="Running")
+    except Exception as e:
+        startup_state.update(status="failed", error=repr(e))
+        print(f"Startup failed: {e!r}")
+        raise
+
+    startup_state["status"] = "ready"
+    print("System Ready ✅")
+
+
+def require_ready():
+    if startup_state["status"] != "ready":
+        raise HTTPException(
+            status_code=503,
+            detail=f"AI service not ready ({startup_state['status']})"
+        )
+
+
+def refresh_risk_artifacts_periodically(stop):
+    while not stop.wait(RISK_REFRESH_SECONDS):
+        if startup_state["status"] == "ready":
+            refresh_risk_artifacts()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    threading.Thread(target=load_artifacts, name="artifact-loader", daemon=True).start()
+    stop_refresh = threading.Event()
+    if RISK_REFRESH_SECONDS > 0:
+        threading.Thread(
+            target=refresh_risk_artifacts_periodically, args=(stop_refresh,),
+            name="risk-refresh", daemon=True
+        ).start()
+    yield
+    stop_refresh.set()
+
 
 # ==========================================
 # FASTAPI INIT
 # ==========================================
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -75,95 +374,341 @@ class UserInput(BaseModel):
     text: str   # e.g. "python, nlp, deep learning"
 
 
+class BatchUserInput(BaseModel):
+    inputs: List[UserInput]
+
+
+# ==========================================
+# QUERY EMBEDDING CACHE
+# ==========================================
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU of query text -> embedding vector
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key, vector):
+        if self.max_size <= 0:
+            return
+        vector.setflags(write=False)   # shared between requests
+        with self.lock:
+            self.entries[key] = vector
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+query_cache = EmbeddingCache(QUERY_CACHE_SIZE)
+
+
+def normalize_query(text):
+    """
+    Canonical form of a skills query: lower-cased, trimmed, sorted
+    e.g. " SQL,python " -> "python, sql"
+    """
+    skills = (s.strip().lower() for s in text.split(","))
+    return ", ".join(sorted(s for s in skills if s))
+
+
+def encode_queries(texts, update_cache=True):
+    """
+    (n, dim) normalized embeddings for a list of queries. Cached vectors are
+    reused and all misses go through the encoder in a single batch. The
+    canonical text is what gets encoded, so every spelling of the same
+    skill set maps to the same vector.
+
+    Bulk jobs pass update_cache=False so one-off profiles do not evict the
+    hot interactive queries.
+    """
+    keys = [normalize_query(t) for t in texts]
+
+    vectors = {}
+    for key in keys:
+        if key not in vectors:
+            vectors[key] = query_cache.get(key)
+
+    missing = [key for key, vector in vectors.items() if vector is None]
+    if missing:
+        with STAGE_SECONDS.time(stage="encode"):
+            encoded = embedder.encode(missing)
+        for key, vector in zip(missing, encoded):
+            vectors[key] = vector
+            if update_cache:
+                query_cache.put(key, vector)
+
+    return np.stack([vectors[key] for key in keys])
+
+
+def search_queries(texts, update_cache=True):
+    """
+    Top-k (cosine scores, indices, match scores, retrieval_path) for each
+    query. Queries of known skills are answered from the skill index
+    ("skill_index"); the rest share one encode + one search ("encoder"),
+    where the match score is the cosine itself.
+    """
+    results = [None] * len(texts)
+
+    if skill_bypass is not None:
+        with STAGE_SECONDS.time(stage="skill_index"):
+            for i, text in enumerate(texts):
+                hit = skill_bypass.search(normalize_query(text).split(", "), TOP_K)
+                if hit is not None:
+                    results[i] = (*hit, "skill_index")
+
+    pending = [i for i, result in enumerate(results) if result is None]
+    if pending:
+        query_embeddings = encode_queries([texts[i] for i in pending], update_cache=update_cache)
+        with STAGE_SECONDS.time(stage="search"):
+            top_scores, top_indices = index.search(query_embeddings, TOP_K)
+        for i, scores, indices in zip(pending, top_scores, top_indices):
+            results[i] = (scores, indices, scores, "encoder")
+
+    RETRIEVAL_PATH.inc(len(texts) - len(pending), path="skill_index")
+    RETRIEVAL_PATH.inc(len(pending), path="encoder")
+    return results
+
+
+def observe_micro_batch(size, queue_wait):
+    SEARCH_BATCH_SIZE.observe(size, source="analyze")
+    STAGE_SECONDS.observe(queue_wait, stage="batch_wait")
+
+
+query_batcher = MicroBatcher(
+    search_queries,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    on_batch=observe_micro_batch
+)
+
+
 # ==========================================
 # HELPER FUNCTIONS
 # ==========================================
 
-def get_top_roles_and_skills(user_text):
+def get_top_roles_and_skills(top_scores, top_indices, match_scores):
+
+    results = []
+    all_skills = {}   # insertion-ordered set
+
+    for idx, score, match in zip(top_indices, top_scores, match_scores):
+        if clusters is None:
+            skill_list = role_table.skills(idx)
+        else:
+            # Hit is a cluster representative: report the skills of every
+            # near-duplicate row it stands for
+            member_rows = clusters.members_of_row(idx)
+            member_skills = {}
+            for row in member_rows:
+                member_skills.update(dict.fromkeys(role_table.skills(row)))
+            skill_list = list(member_skills)
+        all_skills.update(dict.fromkeys(skill_list))
+
+        result = {
+            "role": role_table.role(idx),
+            "skills": skill_list,
+            "similarity_score": float(score),
+            "match_score": float(match)
+        }
+        if clusters is not None:
+            result["cluster_rows"] = member_rows.tolist()
+        results.append(result)
+
+    return results, list(all_skills)
+
+
+# High-demand skills that should have lower risk
+HIGH_DEMAND_SKILLS = {
+    'python', 'javascript', 'typescript', 'react', 'node.js', 'aws',
+    'docker', 'kubernetes', 'machine learning', 'deep learning', 
+    'data science', 'ai', 'nlp', 'tensorflow', 'pytorch', 'sql',
+    'postgresql', 'mongodb', 'rest', 'api design', 'system design',
+    'microservices', 'cloud', 'devops', 'ci/cd', 'git'
+}
+
+# Legacy or declining skills
+DECLINING_SKILLS = {
+    'flash', 'silverlight', 'perl', 'cobol', 'visual basic',
+    'jquery', 'backbone.js', 'angular.js'
+}
+
+# If skill not in dataset, assume moderate-low risk for unknown skills
+UNKNOWN_SKILL_RISK = 0.35
+
+
+def adjust_skill_risk(skill_lower, base_prob):
+    """
+    Apply context-aware adjustments to a raw model score
+    """
+    adjusted_prob = base_prob
+    
+    # Reduce risk for high-demand skills
+    if skill_lower in HIGH_DEMAND_SKILLS:
+        adjusted_prob = base_prob * 0.6  # 40% reduction
     
-    query_embedding = embedder.encode(
-        [user_text],
-        convert_to_numpy=True,
-        normalize_embeddings=True
+    # Increase risk for known declining skills
+    elif skill_lower in DECLINING_SKILLS:
+        adjusted_prob = min(0.95, base_prob * 1.3)
+    
+    # Cap the risk at reasonable levels
+    return max(0.05, min(0.90, adjusted_prob))
+
+
+def build_skill_risk_table(skills, probs):
+    """
+    Index batch scores by lower-cased skill name.
+
+    Returns {skill_lower: (raw_model_score, adjusted_score)}. When a skill
+    appears more than once the first row wins, as the old per-request
+    lookup did.
+    """
+    table = {}
+    for skill, prob in zip(skills, probs):
+        skill = skill.lower()
+        if skill not in table:
+            table[skill] = (float(prob), float(adjust_skill_risk(skill, prob)))
+    return table
+
+
+def build_market_trends(skills, probs):
+    """
+    Ready-to-serve /market-trends payload from batch scores
+    """
+    def records(indices):
+        return [
+            {"skill": skills[i], "decline_risk_probability": float(probs[i])}
+            for i in indices
+        ]
+
+    # Ascending = growing, descending = declining
+    top_growing = np.argsort(probs, kind="stable")[:5]
+    top_declining = np.argsort(-probs, kind="stable")[:5]
+
+    return {
+        "top_growing_skills": records(top_growing),
+        "top_declining_skills": records(top_declining),
+        # Market Stability Index
+        "market_stability_index": float(1 - probs.mean()),
+        # Risk Buckets
+        "risk_distribution": {
+            "low": int((probs < 0.33).sum()),
+            "medium": int(((probs >= 0.33) & (probs < 0.66)).sum()),
+            "high": int((probs >= 0.66).sum())
+        }
+    }
+
+
+def risk_artifact_signature():
+    return tuple(
+        (f.stat().st_mtime_ns, f.stat().st_size) for f in RISK_ARTIFACT_FILES
     )
 
-    similarities = cosine_similarity(query_embedding, embeddings)[0]
 
-    top_indices = np.argsort(similarities)[-TOP_K:][::-1]
+risk_artifacts_lock = threading.Lock()
+risk_artifacts_signature = None
 
-    results = []
-    all_skills = []
 
-    for idx in top_indices:
-        role = mapping_df.iloc[idx]["Role"]
-        skills = mapping_df.iloc[idx]["Skill"]
+def install_risk_scores(skills, probs):
+    """
+    Rebuild everything derived from the per-skill batch scores
+    """
+    global skill_risk_table, role_risk_table, market_trends_payload
 
-        skill_list = [s.strip().lower() for s in skills.split(",")]
-        all_skills.extend(skill_list)
+    table = build_skill_risk_table(skills, probs)
+    raw_by_id = role_table.skill_values({s: raw for s, (raw, _) in table.items()})
+    role_risks = build_role_risk_table(raw_by_id)
+    trends = build_market_trends(skills, probs)
 
-        results.append({
-            "role": role,
-            "skills": skill_list,
-            "similarity_score": float(similarities[idx])
-        })
+    skill_risk_table, role_risk_table = table, role_risks
+    market_trends_payload = trends
+
+
+def load_risk_artifacts():
+    """
+    (Re)load features, model and scaler and rebuild everything derived from them
+    """
+    global risk_artifacts_signature
 
-    return results, list(set(all_skills))
+    # Taken before reading so a write during the load triggers another reload
+    signature = risk_artifact_signature()
+
+    features, _, _, probs = load_and_score(
+        ENGINEERED_FEATURES_FILE, MODEL_FILE, SCALER_FILE
+    )
+    install_risk_scores(features["skill"].tolist(), probs)
+
+    risk_artifacts_signature = signature
+
+
+def refresh_risk_artifacts():
+    """
+    Reload risk artifacts if any of the files changed on disk. With a
+    bundle, changed loose files replace its risk scores (embeddings and
+    mapping stay; a new bundle version needs a restart).
+    """
+    with risk_artifacts_lock:
+        # Keep serving the previous scores when a file is missing, being
+        # replaced or mid-write
+        try:
+            if risk_artifact_signature() == risk_artifacts_signature:
+                return
+        except OSError as e:
+            # A bundle deployment need not ship the loose files at all
+            if bundle is None:
+                print(f"Risk artifacts unavailable, keeping previous scores: {e}")
+            return
+        print("Risk artifacts changed, reloading...")
+        try:
+            load_risk_artifacts()
+        except Exception as e:
+            print(f"Risk artifact reload failed: {e}")
 
 
 def compute_skill_risk(skills_list):
     """
     Compute skill decline risk with context-aware adjustments
     """
-    # High-demand skills that should have lower risk
-    HIGH_DEMAND_SKILLS = {
-        'python', 'javascript', 'typescript', 'react', 'node.js', 'aws',
-        'docker', 'kubernetes', 'machine learning', 'deep learning', 
-        'data science', 'ai', 'nlp', 'tensorflow', 'pytorch', 'sql',
-        'postgresql', 'mongodb', 'rest', 'api design', 'system design',
-        'microservices', 'cloud', 'devops', 'ci/cd', 'git'
-    }
-    
-    # Legacy or declining skills
-    DECLINING_SKILLS = {
-        'flash', 'silverlight', 'perl', 'cobol', 'visual basic',
-        'jquery', 'backbone.js', 'angular.js'
-    }
-
     skill_risks = []
 
     for skill in skills_list:
         skill_lower = skill.lower()
-        
-        skill_data = features_df[
-            features_df["skill"].str.lower() == skill_lower
-        ]
+        scores = skill_risk_table.get(skill_lower)
 
-        if len(skill_data) == 0:
-            # If skill not in dataset, assume moderate-low risk for unknown skills
-            base_prob = 0.35
+        if scores is None:
+            base_prob = UNKNOWN_SKILL_RISK
+            adjusted_prob = adjust_skill_risk(skill_lower, base_prob)
         else:
-            skill_row = skill_data.iloc[0]
-            model_features = scaler.feature_names_in_
-            X_df = pd.DataFrame(
-                [skill_row[model_features].values],
-                columns=model_features
-            )
-            X_scaled = scaler.transform(X_df)
-            base_prob = risk_model.predict_proba(X_scaled)[0][1]
-
-        # Apply context-aware adjustments
-        adjusted_prob = base_prob
-        
-        # Reduce risk for high-demand skills
-        if skill_lower in HIGH_DEMAND_SKILLS:
-            adjusted_prob = base_prob * 0.6  # 40% reduction
-        
-        # Increase risk for known declining skills
-        elif skill_lower in DECLINING_SKILLS:
-            adjusted_prob = min(0.95, base_prob * 1.3)
-        
-        # Cap the risk at reasonable levels
-        adjusted_prob = max(0.05, min(0.90, adjusted_prob))
+            base_prob, adjusted_prob = scores
 
         skill_risks.append({
             "skill": skill,
@@ -174,60 +719,98 @@ def compute_skill_risk(skills_list):
     return skill_risks
 
 
-def compute_role_decline_risk(role_name, role_skills):
+# High-growth roles that should have lower risk
+HIGH_GROWTH_ROLES = {
+    'data scientist', 'machine learning engineer', 'ai engineer',
+    'cloud engineer', 'devops engineer', 'full stack developer',
+    'software engineer', 'data engineer', 'mlops engineer',
+    'cloud solutions architect', 'platform engineer', 'site reliability engineer'
+}
+
+# Declining or saturated roles
+DECLINING_ROLES = {
+    'flash developer', 'webmaster', 'data entry specialist'
+}
+
+
+def build_role_risk_table(raw_by_id):
     """
-    Compute role decline risk with market-aware adjustments
+    Role decline risk of every mapping row at once, with market-aware
+    adjustments. Depends only on the row's role and skills, so it is
+    computed when risk scores are (re)loaded and looked up per hit.
+
+    With near-duplicate clusters a hit stands for its whole cluster, so
+    every member row gets the risk of the cluster's distinct skills - the
+    list get_top_roles_and_skills reports for it.
+
+    raw_by_id: raw model score per interned skill ID (NaN = not in the
+    features data, left out). Returns per-row arrays; rows with no scored
+    skill have total_skills_analyzed == 0.
     """
-    # High-growth roles that should have lower risk
-    HIGH_GROWTH_ROLES = {
-        'data scientist', 'machine learning engineer', 'ai engineer',
-        'cloud engineer', 'devops engineer', 'full stack developer',
-        'software engineer', 'data engineer', 'mlops engineer',
-        'cloud solutions architect', 'platform engineer', 'site reliability engineer'
-    }
-    
-    # Declining or saturated roles
-    DECLINING_ROLES = {
-        'flash developer', 'webmaster', 'data entry specialist'
-    }
-    
-    skill_list = [s.strip().lower() for s in role_skills.split(",")]
-    risk_scores = []
-    
-    for skill in skill_list:
-        skill_data = features_df[features_df["skill"].str.lower() == skill.lower()]
-        if len(skill_data) == 0:
-            continue
-            
-        skill_row = skill_data.iloc[0]
-        model_features = scaler.feature_names_in_
-        X_df = pd.DataFrame([skill_row[model_features].values], columns=model_features)
-        X_scaled = scaler.transform(X_df)
-        prob = risk_model.predict_proba(X_scaled)[0][1]
-        risk_scores.append(prob)
-    
-    if not risk_scores:
-        return None
-    
-    avg_risk = np.mean(risk_scores)
-    max_risk = np.max(risk_scores)
-    high_risk_count = sum(1 for r in risk_scores if r > 0.6)
-    
+    rows = len(role_table)
+    entry_units = np.repeat(np.arange(rows), np.diff(role_table.skill_indptr))
+    skill_ids = np.asarray(role_table.skill_ids, dtype=np.int64)
+    units, unit_rows = rows, np.arange(rows)
+    if clusters is not None:
+        # One entry per distinct (cluster, skill)
+        vocab = len(role_table.skill_vocab)
+        keys = np.unique(clusters.row_cluster[entry_units].astype(np.int64) * vocab + skill_ids)
+        entry_units, skill_ids = keys // vocab, keys % vocab
+        units, unit_rows = len(clusters), clusters.representatives
+
+    scores = raw_by_id[skill_ids]
+    valid = ~np.isnan(scores)
+    entry_units, scores = entry_units[valid], scores[valid]
+
+    counts = np.bincount(entry_units, minlength=units)
+    avg_risk = np.bincount(entry_units, weights=scores, minlength=units) / np.maximum(counts, 1)
+    max_risk = np.zeros(units)
+    np.maximum.at(max_risk, entry_units, scores)
+    high_risk_count = np.bincount(entry_units, weights=scores > 0.6, minlength=units).astype(np.int64)
+
     # Base calculation
-    base_role_score = 0.5 * avg_risk + 0.3 * max_risk + 0.2 * (high_risk_count / len(risk_scores))
-    
+    base_role_score = (
+        0.5 * avg_risk + 0.3 * max_risk + 0.2 * (high_risk_count / np.maximum(counts, 1))
+    )
+
     # Apply role-specific adjustments
-    role_lower = role_name.lower()
-    adjusted_score = base_role_score
-    
-    if role_lower in HIGH_GROWTH_ROLES:
-        adjusted_score = base_role_score * 0.5  # 50% reduction for high-growth roles
-    elif role_lower in DECLINING_ROLES:
-        adjusted_score = min(0.95, base_role_score * 1.4)
-    
+    role_lower = np.array([name.lower() for name in role_table.role_names], dtype=object)
+    row_roles = role_lower[np.asarray(role_table.row_role_ids)[unit_rows]]
+    high_growth = np.isin(row_roles, list(HIGH_GROWTH_ROLES))
+    declining = np.isin(row_roles, list(DECLINING_ROLES)) & ~high_growth
+
+    adjusted_score = base_role_score.copy()
+    adjusted_score[high_growth] *= 0.5  # 50% reduction for high-growth roles
+    adjusted_score[declining] = np.minimum(0.95, base_role_score[declining] * 1.4)
+
     # Cap at reasonable levels
-    adjusted_score = max(0.05, min(0.85, adjusted_score))
-    
+    adjusted_score = np.clip(adjusted_score, 0.05, 0.85)
+
+    table = {
+        "role_decline_score": adjusted_score,
+        "average_skill_risk": avg_risk,
+        "highest_skill_risk": max_risk,
+        "high_risk_skills_count": high_risk_count,
+        "total_skills_analyzed": counts,
+    }
+    if clusters is not None:
+        # Spread each cluster's entry to its member rows
+        table = {name: values[clusters.row_cluster] for name, values in table.items()}
+    return table
+
+
+def role_decline_risk(row):
+    """
+    Precomputed role decline risk of a mapping row (None if none of its
+    skills has a risk score)
+    """
+    table = role_risk_table
+    total = int(table["total_skills_analyzed"][row])
+    if total == 0:
+        return None
+
+    adjusted_score = float(table["role_decline_score"][row])
+
     # Determine risk category with adjusted thresholds
     if adjusted_score < 0.35:
         risk_category = "Low Risk"
@@ -235,15 +818,15 @@ def compute_role_decline_risk(role_name, role_skills):
         risk_category = "Medium Risk"
     else:
         risk_category = "High Risk"
-    
+
     return {
-        "role": role_name,
-        "role_decline_score": float(adjusted_score),
+        "role": role_table.role(row),
+        "role_decline_score": adjusted_score,
         "risk_category": risk_category,
-        "average_skill_risk": float(avg_risk),
-        "highest_skill_risk": float(max_risk),
-        "high_risk_skills_count": high_risk_count,
-        "total_skills_analyzed": len(risk_scores)
+        "average_skill_risk": float(table["average_skill_risk"][row]),
+        "highest_skill_risk": float(table["highest_skill_risk"][row]),
+        "high_risk_skills_count": int(table["high_risk_skills_count"][row]),
+        "total_skills_analyzed": total
     }
 
 
@@ -251,24 +834,28 @@ def compute_role_decline_risk(role_name, role_skills):
 # MAIN API ROUTE
 # ==========================================
 
-@app.post("/analyze")
-def analyze(user_input: UserInput):
+def build_analysis(top_scores, top_indices, match_scores):
+    """
+    /analyze response for one query's search hits
+    """
+    with STAGE_SECONDS.time(stage="role_skills"):
+        roles_output, skills_list = get_top_roles_and_skills(
+            top_scores, top_indices, match_scores
+        )
 
-    roles_output, skills_list = get_top_roles_and_skills(user_input.text)
+    with STAGE_SECONDS.time(stage="skill_risk"):
+        skill_risk_output = compute_skill_risk(skills_list)
 
-    skill_risk_output = compute_skill_risk(skills_list)
-    
-    # Compute role decline risk for each matched role
+    # Look up the precomputed role decline risk of each matched role
+    role_risk_start = time.perf_counter()
     role_decline_analysis = []
-    for role_data in roles_output:
-        role_name = role_data["role"]
-        role_skills = role_data["skills"]
-        role_skills_str = ", ".join(role_skills)
-        
-        role_risk = compute_role_decline_risk(role_name, role_skills_str)
+    for row, role_data in zip(top_indices, roles_output):
+        role_risk = role_decline_risk(row)
+
         if role_risk:
             role_risk["similarity_score"] = role_data["similarity_score"]
             role_decline_analysis.append(role_risk)
+    STAGE_SECONDS.observe(time.perf_counter() - role_risk_start, stage="role_risk")
 
     return {
         "matched_roles": roles_output,
@@ -276,67 +863,125 @@ def analyze(user_input: UserInput):
         "role_decline_analysis": role_decline_analysis
     }
 
-@app.get("/health")
-def health():
-    return {"status": "AI service running 🚀"}
 
-@app.get("/market-trends")
-def market_trends():
-
-    all_results = []
+@app.post("/analyze", dependencies=[Depends(require_ready)])
+async def analyze(user_input: UserInput):
 
-    model_features = scaler.feature_names_in_
+    with REQUEST_SECONDS.time(endpoint="/analyze"):
+        top_scores, top_indices, match_scores, path = await query_batcher.submit(user_input.text)
 
-    for _, row in features_df.iterrows():
+        result = build_analysis(top_scores, top_indices, match_scores)
+        result["retrieval_path"] = path
+        return result
 
-        X_df = pd.DataFrame(
-            [row[model_features].values],
-            columns=model_features
-        )
 
-        X_scaled = scaler.transform(X_df)
-        prob = risk_model.predict_proba(X_scaled)[0][1]
+def stream_batch_analysis(texts):
+    """
+    NDJSON lines for /analyze/batch, produced ANALYZE_BATCH_CHUNK at a time
+    """
+    with REQUEST_SECONDS.time(endpoint="/analyze/batch"):
+        for start in range(0, len(texts), ANALYZE_BATCH_CHUNK):
+            chunk = texts[start:start + ANALYZE_BATCH_CHUNK]
+            SEARCH_BATCH_SIZE.observe(len(chunk), source="analyze_batch")
+            hits = search_queries(chunk, update_cache=False)
 
-        all_results.append({
-            "skill": row["skill"],
-            "decline_risk_probability": float(prob)
-        })
+            lines = []
+            for offset, (top_scores, top_indices, match_scores, path) in enumerate(hits):
+                result = build_analysis(top_scores, top_indices, match_scores)
+                result["retrieval_path"] = path
+                result["index"] = start + offset
+                lines.append(json.dumps(result))
 
-    trends_df = pd.DataFrame(all_results)
+            yield "\n".join(lines) + "\n"
 
-    # Sort ascending = growing
-    top_growing = trends_df.sort_values(
-        "decline_risk_probability"
-    ).head(5)
 
-    # Sort descending = declining
-    top_declining = trends_df.sort_values(
-        "decline_risk_probability",
-        ascending=False
-    ).head(5)
+@app.post("/analyze/batch", dependencies=[Depends(require_ready)])
+def analyze_batch(batch: BatchUserInput):
+    """
+    Score many profiles in one call. Streams one JSON object per input as
+    NDJSON, in input order, each tagged with its position as "index".
+    """
+    texts = [item.text for item in batch.inputs]
 
-    # Market Stability Index
-    stability_index = float(
-        1 - trends_df["decline_risk_probability"].mean()
+    return StreamingResponse(
+        stream_batch_analysis(texts),
+        media_type="application/x-ndjson"
     )
 
-    # Risk Buckets
-    low = len(trends_df[trends_df["decline_risk_probability"] < 0.33])
-    medium = len(
-        trends_df[
-            (trends_df["decline_risk_probability"] >= 0.33) &
-            (trends_df["decline_risk_probability"] < 0.66)
-        ]
-    )
-    high = len(trends_df[trends_df["decline_risk_probability"] >= 0.66])
+@app.get("/health")
+def health():
+    return {"status": "AI service running 🚀"}
 
-    return {
-        "top_growing_skills": top_growing.to_dict(orient="records"),
-        "top_declining_skills": top_declining.to_dict(orient="records"),
-        "market_stability_index": stability_index,
-        "risk_distribution": {
-            "low": low,
-            "medium": medium,
-            "high": high
-        }
-    }
\ No newline at end of file
+@app.get("/live")
+def live():
+    """
+    Liveness: the process is up and serving HTTP (artifacts may still load).
+    503 once loading has failed: this worker can never become ready.
+    """
+    if startup_state["status"] == "failed":
+        return JSONResponse(
+            {"status": "failed", "error": startup_state["error"]}, status_code=503
+        )
+    return {"status": "alive"}
+
+@app.get("/ready")
+def ready():
+    """
+    Readiness: all artifacts loaded and the encoder warmed up
+    """
+    body = {
+        "status": startup_state["status"],
+        "artifact_load_seconds": artifact_load_seconds,
+        "bundle_version": bundle.version if bundle is not None else None
+    }
+    if startup_state["error"]:
+        body["error"] = startup_state["error"]
+
+    status_code = 200 if startup_state["status"] == "ready" else 503
+    return JSONResponse(body, status_code=status_code)
+
+@app.get("/cache-stats")
+def cache_stats():
+    return query_cache.stats()
+
+@app.get("/batch-stats")
+def batch_stats():
+    return query_batcher.stats()
+
+def cache_stat(name):
+    return lambda: query_cache.stats()[name]
+
+
+metrics.callback(
+    "ai_ready", "1 once artifacts are loaded and the encoder is warm",
+    lambda: int(startup_state["status"] == "ready")
+)
+metrics.callback(
+    "ai_artifact_load_seconds", "Startup load time per artifact",
+    lambda: {(name,): seconds for name, seconds in artifact_load_seconds.items()},
+    labelnames=["artifact"]
+)
+metrics.callback("ai_query_cache_hits_total", "Query embedding cache hits",
+                 cache_stat("hits"), type="counter")
+metrics.callback("ai_query_cache_misses_total", "Query embedding cache misses",
+                 cache_stat("misses"), type="counter")
+metrics.callback("ai_query_cache_evictions_total", "Query embedding cache evictions",
+                 cache_stat("evictions"), type="counter")
+metrics.callback("ai_query_cache_entries", "Query embeddings currently cached",
+                 cache_stat("size"))
+metrics.callback("ai_query_cache_hit_ratio", "Query embedding cache hit rate since start",
+                 cache_stat("hit_rate"))
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+@app.get("/retrieval-stats", dependencies=[Depends(require_ready)])
+def retrieval_stats():
+    return retrieval_report
+
+@app.get("/market-trends", dependencies=[Depends(require_ready)])
+def market_trends():
+    refresh_risk_artifacts()
+    return market_trends_payload
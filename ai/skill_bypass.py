@@ -0,0 +1,118 @@
+# ==========================================
+# skill_bypass.py
+# Encoder-free retrieval for queries made of known skill names
+# ==========================================
+#
+# Most /analyze inputs are plain lists of skills that already occur in the
+# mapping. For those, an inverted index (skill -> mapping rows) yields the
+# candidate roles directly and they are ranked by skill overlap:
+#
+#   overlap(row) = |query skills & row skills| / sqrt(|query| * |row skills|)
+#
+# optionally blended with the cosine between the row embedding and the mean
+# of the per-skill vectors (each skill name is encoded once, then cached):
+#
+#   score = (1 - vector_weight) * overlap + vector_weight * cosine
+#
+# That score only ranks the hits and is returned as the match score. The
+# similarity returned for each hit is still a cosine (row embedding vs the
+# mean skill vector), so it means the same as on the encoder path.
+#
+# Queries with free text or unknown skills, or with fewer than k candidate
+# roles, return None and go through the encoder as before.
+
+import threading
+
+import numpy as np
+
+
+class SkillVectorCache:
+    """
+    Embedding of every skill name in the vocabulary, encoded on first use
+    """
+
+    def __init__(self, vocab, encode, dimension):
+        self.vocab = vocab
+        self.encode = encode
+        self.vectors = np.zeros((len(vocab), dimension), dtype=np.float32)
+        self.ready = np.zeros(len(vocab), dtype=bool)
+        self.lock = threading.Lock()
+
+    def get(self, skill_ids):
+        missing = [i for i in skill_ids if not self.ready[i]]
+        if missing:
+            encoded = self.encode([self.vocab[i] for i in missing])
+            with self.lock:
+                self.vectors[missing] = encoded
+                self.ready[missing] = True
+        return self.vectors[skill_ids]
+
+
+class SkillOverlapIndex:
+
+    def __init__(self, table, embeddings, skill_vectors, clusters=None, vector_weight=0.5):
+        self.table = table
+        self.embeddings = embeddings
+        self.skill_vectors = skill_vectors
+        self.clusters = clusters
+        self.vector_weight = vector_weight
+
+        # Inverted CSR: rows_of_skill[s] = row_ids[row_indptr[s]:row_indptr[s + 1]]
+        skill_ids = np.asarray(table.skill_ids)
+        owners = np.repeat(
+            np.arange(len(table), dtype=np.int64), np.diff(np.asarray(table.skill_indptr))
+        )
+        order = np.argsort(skill_ids, kind="stable")
+        self.row_ids = owners[order]
+        self.row_indptr = np.zeros(len(table.skill_vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(skill_ids, minlength=len(table.skill_vocab)), out=self.row_indptr[1:])
+        self.row_sizes = np.diff(np.asarray(table.skill_indptr))
+
+    def query_skill_ids(self, skills):
+        """
+        Vocabulary IDs of the query skills, or None if any is unknown
+        """
+        ids = []
+        for skill in skills:
+            skill_id = self.table.skill_index.get(skill)
+            if skill_id is None:
+                return None
+            ids.append(skill_id)
+        return sorted(set(ids))
+
+    def search(self, skills, k):
+        """
+        (cosine similarities, rows, match scores) best first for a list of
+        normalized skill names, or None when the query needs the encoder
+        """
+        skill_ids = self.query_skill_ids(skills)
+        if not skill_ids:
+            return None
+
+        candidates = np.concatenate([
+            self.row_ids[self.row_indptr[s]:self.row_indptr[s + 1]] for s in skill_ids
+        ])
+        rows, overlap = np.unique(candidates, return_counts=True)
+        scores = overlap / np.sqrt(len(skill_ids) * self.row_sizes[rows])
+
+        query_vector = self.skill_vectors.get(skill_ids).mean(axis=0)
+        query_vector /= max(np.linalg.norm(query_vector), 1e-12)
+        if self.vector_weight:
+            cosine = self.embeddings.rows(rows) @ query_vector
+            scores = (1 - self.vector_weight) * scores + self.vector_weight * cosine
+
+        if self.clusters is not None:
+            # Same contract as ClusteredIndex: one hit per cluster, reported
+            # as its representative row
+            rows = self.clusters.representatives[self.clusters.row_cluster[rows]]
+            best = np.lexsort((-scores, rows))
+            rows, first = np.unique(rows[best], return_index=True)
+            scores = scores[best][first]
+
+        if len(rows) < k:
+            return None
+
+        top = np.argsort(-scores, kind="stable")[:k]
+        rows = rows[top]
+        similarity = self.embeddings.rows(rows) @ query_vector
+        return similarity.astype(np.float32), rows, scores[top].astype(np.float32)
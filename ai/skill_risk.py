@@ -0,0 +1,30 @@
+# ==========================================
+# skill_risk.py
+# Batch scoring of engineered skill features
+# ==========================================
+#
+# Shared by server.py (scores at startup / on artifact change) and
+# bundle.py (scores baked into the serving bundle).
+
+import joblib
+import pandas as pd
+
+
+def score_features(features, model, feature_scaler):
+    """
+    Raw decline probability for every row of the features frame, in one batch
+    """
+    model_features = feature_scaler.feature_names_in_
+    X_scaled = feature_scaler.transform(features[model_features])
+    return model.predict_proba(X_scaled)[:, 1]
+
+
+def load_and_score(features_file, model_file, scaler_file):
+    """
+    Read the features CSV and both pickles and score every row.
+    Returns (features, model, scaler, probs).
+    """
+    features = pd.read_csv(features_file)
+    model = joblib.load(model_file)
+    feature_scaler = joblib.load(scaler_file)
+    return features, model, feature_scaler, score_features(features, model, feature_scaler)
@@ -1,5 +1,11 @@
 """
 parse_roadmap.py — Edit CONFIG then run: python parse_roadmap.py
+
+Batch mode compiles every roadmap in ROLE_TO_FOLDER (roadmap_roles.py, the
+mapping roadmap_server.py uses; plus any extra folders given) in parallel
+into a prebuilt store for roadmap_server.py:
+
+  python parse_roadmap.py --all [--store roadmap_store] [--workers N] [folder ...]
 """
 
 # ===========================================================================
@@ -7,7 +13,8 @@ parse_roadmap.py — Edit CONFIG then run: python parse_roadmap.py
 # ===========================================================================
 REPO_PATH = r"C:\Users\naeva\OneDrive\Desktop\Makeathon 2026\developer-roadmap"
 
-# Set ROLE to one of the 19 supported user-facing role names:
+# Set ROLE to one of the 19 supported user-facing role names
+# (mapping in roadmap_roles.py):
 #
 #   "Front End Developer"         → roadmap: frontend
 #   "Back End Developer"          → roadmap: backend
@@ -18,9 +25,9 @@ REPO_PATH = r"C:\Users\naeva\OneDrive\Desktop\Makeathon 2026\developer-roadmap"
 #   "Cloud Solutions Architect"   → roadmap: aws             (closest match)
 #   "Software Engineer"           → roadmap: backend         (closest match)
 #   "Data Analyst"                → roadmap: data-analyst
-#   "Business Intelligence Analyst" → roadmap: data-analyst  (closest match)
+#   "Business Intelligence Analyst" → roadmap: bi-analyst
 #   "Data Scientist"              → roadmap: ai-data-scientist
-#   "Machine Learning Engineer"   → roadmap: mlops
+#   "Machine Learning Engineer"   → roadmap: machine-learning
 #   "MLOps Engineer"              → roadmap: mlops
 #   "Artificial Intelligence Engineer" → roadmap: ai-engineer
 #   "Cybersecurity Analyst"       → roadmap: cyber-security
@@ -36,45 +43,18 @@ ROLE = "Front End Developer"
 KNOWN_SKILLS = ["HTML", "CSS"]
 
 OUTPUT_FILE = "roadmap_data.json"
+
+# Batch mode (--all) output directory, see roadmap_store.py
+STORE_DIR = "roadmap_store"
 # ===========================================================================
 
-import json, re
+import argparse, json, os, re, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-
-# ---------------------------------------------------------------------------
-# Role → repo folder name mapping
-# ---------------------------------------------------------------------------
-ROLE_TO_FOLDER = {
-    "front end developer":              "frontend",
-    "back end developer":               "backend",
-    "full stack developer":             "full-stack",
-    "devops engineer":                  "devops",
-    "platform engineer":                "devops",           # closest match
-    "cloud engineer":                   "aws",              # closest match
-    "cloud solutions architect":        "aws",              # closest match
-    "software engineer":                "backend",          # closest match
-    "data analyst":                     "data-analyst",
-    "business intelligence analyst":    "data-analyst",     # closest match
-    "data scientist":                   "ai-data-scientist",
-    "machine learning engineer":        "mlops",
-    "mlops engineer":                   "mlops",
-    "artificial intelligence engineer": "ai-engineer",
-    "cybersecurity analyst":            "cyber-security",
-    "network security engineer":        "cyber-security",   # closest match
-    "ux designer":                      "ux-design",
-    "game developer":                   "game-developer",
-    "product manager":                  "product-manager",
-}
-
-
-def resolve_folder(role: str) -> str:
-    """Map a user-facing role name to the roadmap.sh repo folder name."""
-    key = role.strip().lower()
-    if key in ROLE_TO_FOLDER:
-        return ROLE_TO_FOLDER[key]
-    # If already a valid folder name, pass through
-    return key
+from roadmap_content import ContentIndex
+from roadmap_roles import ROLE_TO_FOLDER, resolve_folder
+from roadmap_store import write_manifest, write_roadmap
 
 
 def load_json(repo, folder):
@@ -91,17 +71,6 @@ def get_content_dir(repo, folder):
     return Path(repo) / "src/data/roadmaps" / folder / "content"
 
 
-def load_md(cdir, node_id):
-    if not cdir.exists():
-        return ""
-    clean = node_id.rstrip("-")
-    for f in cdir.glob("*.md"):
-        part = f.stem.split("@")[-1] if "@" in f.stem else ""
-        if part in (clean, node_id):
-            return f.read_text(encoding="utf-8")
-    return ""
-
-
 def get_label(node):
     d = node.get("data", {})
     raw = d.get("label", d.get("title", d.get("text", "")))
@@ -128,16 +97,13 @@ def is_annotation(label):
     return any(p in low for p in SKIP_PHRASES)
 
 
-def extract(repo, role_input, known_skills):
-    folder = resolve_folder(role_input)
-    print(f"Role : {role_input}  →  folder: {folder}")
-
+def compile_roadmap(repo, folder):
+    """Filtered nodes (with markdown content) and edges of one roadmap folder."""
     data  = load_json(repo, folder)
     nodes = data.get("nodes", [])
     edges = data.get("edges", [])
-    cdir  = get_content_dir(repo, folder)
-
-    known_lower = {s.lower().strip() for s in known_skills}
+    # Content folder listed once; node IDs resolve with a dict lookup
+    contents = ContentIndex(get_content_dir(repo, folder))
 
     # Build edge connection set
     connected_ids = set()
@@ -187,11 +153,7 @@ def extract(repo, role_input, known_skills):
             "y":       float(pos.get("y", 0)),
             "w":       w,
             "h":       h,
-            "content": load_md(cdir, n["id"]),
-            # "known" = true means the user already knows this skill → highlighted red in viewer
-            "known":   label.lower() in known_lower,
-            # Keep "skipped" as an alias for backwards compatibility with existing viewer
-            "skipped": label.lower() in known_lower,
+            "content": contents.load(n["id"]),
         })
 
     # Edges — only between visible nodes
@@ -218,14 +180,86 @@ def extract(repo, role_input, known_skills):
         })
 
     return {
-        "role":   role_input,
         "folder": folder,
         "nodes":  out_nodes,
         "edges":  out_edges,
+    }
+
+
+def extract(repo, role_input, known_skills):
+    folder = resolve_folder(role_input)
+    print(f"Role : {role_input}  →  folder: {folder}")
+
+    roadmap     = compile_roadmap(repo, folder)
+    known_lower = {s.lower().strip() for s in known_skills}
+
+    out_nodes = []
+    for n in roadmap["nodes"]:
+        known = n["label"].lower() in known_lower
+        out_nodes.append({
+            **n,
+            # "known" = true means the user already knows this skill → highlighted red in viewer
+            "known":   known,
+            # Keep "skipped" as an alias for backwards compatibility with existing viewer
+            "skipped": known,
+        })
+
+    return {
+        "role":   role_input,
+        "folder": folder,
+        "nodes":  out_nodes,
+        "edges":  roadmap["edges"],
         "known":  list(known_lower),
     }
 
 
+# ---------------------------------------------------------------------------
+# Batch mode: every roadmap → prebuilt store
+# ---------------------------------------------------------------------------
+def compile_to_store(repo, folder, store_dir):
+    """Process pool task: compile one folder and write it to the store."""
+    return write_roadmap(store_dir, compile_roadmap(repo, folder))
+
+
+def compile_all(repo, store_dir, folders, workers=None):
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    t0 = time.perf_counter()
+    entries, failed = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(compile_to_store, repo, f, store_dir): f for f in folders}
+        for future in as_completed(futures):
+            folder = futures[future]
+            try:
+                entries[folder] = future.result()
+            except Exception as e:
+                failed[folder] = e
+                print(f"  FAILED {folder}: {e}")
+                continue
+            entry = entries[folder]
+            print(f"  {folder:<20} nodes: {entry['nodes']:>4}  edges: {entry['edges']:>4}  "
+                  f"{entry['bytes'] / 1024:.0f} KB")
+
+    print(f"Compiled {len(entries)}/{len(folders)} roadmaps in "
+          f"{time.perf_counter() - t0:.1f}s")
+    if failed:
+        # No manifest: the server must never load a store missing a folder
+        print(f"Store NOT published ({len(failed)} failed): {', '.join(sorted(failed))}")
+        return entries, failed
+
+    write_manifest(store_dir, entries, str(repo))
+    print(f"Store published → {store_dir}")
+    return entries, failed
+
+
+def main_batch(args):
+    print(f"Repo : {args.repo}")
+    folders = sorted(set(ROLE_TO_FOLDER.values()) | set(args.folders))
+    _, failed = compile_all(args.repo, args.store, folders, args.workers)
+    return 1 if failed else 0
+
+
 def main():
     print(f"Repo : {REPO_PATH}")
     print(f"Known skills (highlighted red): {KNOWN_SKILLS}")
@@ -248,4 +282,16 @@ def main():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract roadmap.sh roadmaps.")
+    parser.add_argument("--all", action="store_true",
+                        help="compile every ROLE_TO_FOLDER roadmap into --store")
+    parser.add_argument("folders", nargs="*",
+                        help="extra roadmap folders to compile with --all")
+    parser.add_argument("--repo", default=REPO_PATH)
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if args.all:
+        sys.exit(main_batch(args))
     main()
\ No newline at end of file
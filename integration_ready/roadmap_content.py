@@ -0,0 +1,73 @@
+"""
+roadmap_content.py — node ID → markdown file index for a roadmap's content/ folder.
+
+Content files are named "<slug>@<node id>.md". Instead of globbing the
+folder and splitting every filename once per node, the folder is listed
+once and node IDs resolve with a dict lookup. Markdown bodies are read
+lazily on first use and kept.
+
+Used by roadmap_server.py and parse_roadmap.py.
+"""
+
+import threading
+from pathlib import Path
+
+
+def node_key(path: Path) -> str:
+    """ID part of a content filename ("" when it has no '@')."""
+    return path.stem.split("@")[-1] if "@" in path.stem else ""
+
+
+class ContentIndex:
+    def __init__(self, cdir: Path):
+        self.cdir   = Path(cdir)
+        self.files  = {}    # node key -> (listing position, path)
+        self.bodies = {}    # path -> markdown
+        if self.cdir.exists():
+            # First file in listing order wins, as with the old per-node glob
+            for pos, f in enumerate(self.cdir.glob("*.md")):
+                self.files.setdefault(node_key(f), (pos, f))
+
+    def __len__(self):
+        return len(self.files)
+
+    def path(self, node_id: str):
+        """Content file of a node (IDs may carry trailing dashes), or None."""
+        hits = [self.files[k] for k in {node_id.rstrip("-"), node_id} if k in self.files]
+        return min(hits)[1] if hits else None
+
+    def load(self, node_id: str) -> str:
+        path = self.path(node_id)
+        if path is None:
+            return ""
+        body = self.bodies.get(path)
+        if body is None:
+            body = self.bodies[path] = path.read_text(encoding="utf-8")
+        return body
+
+
+_indexes = {}   # content dir -> (dir mtime, ContentIndex)
+_indexes_lock = threading.Lock()
+
+
+def content_index(cdir: Path) -> ContentIndex:
+    """
+    Shared index for a content folder, rebuilt when files are added,
+    removed or replaced there (directory mtime changes).
+    """
+    cdir = Path(cdir)
+    mtime = cdir.stat().st_mtime_ns if cdir.exists() else None
+    with _indexes_lock:
+        entry = _indexes.get(cdir)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+    index = ContentIndex(cdir)
+    with _indexes_lock:
+        _indexes[cdir] = (mtime, index)
+    return index
+
+
+def drop_content_index(cdir: Path):
+    """Forget a folder's index and markdown (files edited in place)."""
+    with _indexes_lock:
+        _indexes.pop(Path(cdir), None)
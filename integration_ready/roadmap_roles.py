@@ -0,0 +1,36 @@
+"""
+roadmap_roles.py — user-facing role name → roadmap.sh repo folder.
+
+The one mapping used by roadmap_server.py (requests) and parse_roadmap.py
+(single-role runs and the --all store build), so a prebuilt store always
+has every folder the server can ask for.
+"""
+
+ROLE_TO_FOLDER = {
+    "front end developer":               "frontend",
+    "back end developer":                "backend",
+    "full stack developer":              "full-stack",
+    "devops engineer":                   "devops",
+    "platform engineer":                 "devops",            # closest match
+    "cloud engineer":                    "aws",               # closest match
+    "cloud solutions architect":         "aws",               # closest match
+    "software engineer":                 "backend",           # closest match
+    "data analyst":                      "data-analyst",
+    "business intelligence analyst":     "bi-analyst",
+    "data scientist":                    "ai-data-scientist",
+    "machine learning engineer":         "machine-learning",
+    "mlops engineer":                    "mlops",
+    "artificial intelligence engineer":  "ai-engineer",
+    "cybersecurity analyst":             "cyber-security",
+    "network security engineer":         "cyber-security",    # closest match
+    "ux designer":                       "ux-design",
+    "game developer":                    "game-developer",
+    "product manager":                   "product-manager",
+}
+
+
+def resolve_folder(role: str) -> str:
+    """Map a user-facing role name to the roadmap.sh repo folder name."""
+    key = role.strip().lower()
+    # Unknown names pass through: they may already be a folder name
+    return ROLE_TO_FOLDER.get(key, key)
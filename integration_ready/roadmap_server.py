@@ -6,44 +6,91 @@ Then your other component calls: GET /api/roadmap?role=Front+End+Developer&known
 
 Or open the viewer directly:
   http://localhost:5050/viewer?role=Front+End+Developer&known=HTML,CSS
+
+Add slim=1 to get the graph without markdown, then fetch content per node:
+  GET /api/roadmap/content?role=Front+End+Developer&ids=<id>,<id>
+Responses carry ETag/Last-Modified (304 on revalidation) and are gzipped
+for clients that accept it.
+
+Cached roadmaps are rebuilt in the background when the checkout changes
+(e.g. git pull), see roadmap_watch.py and ROADMAP_WATCH.
+
+Prometheus metrics (extraction stage timings, request latency): GET /metrics
+
+To serve prebuilt roadmaps instead of the developer-roadmap checkout:
+  python parse_roadmap.py --all --store roadmap_store
+  ROADMAP_STORE=roadmap_store python roadmap_server.py
 """
 
+import gzip
+import hashlib
 import json
+import os
 import re
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from flask import Flask, jsonify, request, send_from_directory, Response
+from flask import Flask, g, jsonify, request, send_from_directory, Response
 from flask_cors import CORS
 
+from metrics import CONTENT_TYPE, Registry
+from roadmap_content import content_index, drop_content_index
+from roadmap_roles import ROLE_TO_FOLDER, resolve_folder
+from roadmap_store import MANIFEST_FILE, load_store
+from roadmap_watch import RoadmapWatcher
+
 # ── CONFIG ──────────────────────────────────────────────────────────────────
-REPO_PATH = r"E:\VelocityAI\integration_ready\developer-roadmap"
-PORT      = 5050
+REPO_PATH = os.environ.get("ROADMAP_REPO_PATH", r"E:\VelocityAI\integration_ready\developer-roadmap")
+PORT      = int(os.environ.get("ROADMAP_PORT", "5050"))
+# Extracted roadmaps kept in memory (one per folder, 0 disables the cache)
+ROADMAP_CACHE_SIZE = int(os.environ.get("ROADMAP_CACHE_SIZE", "32"))
+# Prebuilt store from parse_roadmap.py --all; when set, roadmaps are served
+# from it and REPO_PATH is not read at all
+ROADMAP_STORE = os.environ.get("ROADMAP_STORE", "")
+# Responses at least this large are gzipped when the client accepts it
+GZIP_MIN_SIZE = int(os.environ.get("ROADMAP_GZIP_MIN_SIZE", "1024"))
+GZIP_LEVEL    = int(os.environ.get("ROADMAP_GZIP_LEVEL", "6"))
+# Watch the checkout and rebuild changed roadmaps: auto (inotify, else
+# polling every ROADMAP_WATCH_INTERVAL s), inotify, poll or off. While the
+# watcher runs, cache hits skip the per-request file stat.
+ROADMAP_WATCH          = os.environ.get("ROADMAP_WATCH", "auto")
+ROADMAP_WATCH_INTERVAL = float(os.environ.get("ROADMAP_WATCH_INTERVAL", "2.0"))
+ROADMAP_WATCH_DEBOUNCE = float(os.environ.get("ROADMAP_WATCH_DEBOUNCE", "0.5"))
 # ────────────────────────────────────────────────────────────────────────────
 
 app = Flask(__name__, static_folder=".")
+app.json.compact = True   # no pretty-printing, even with debug=True
 CORS(app)   # allow your quiz component (different port) to call this API
 
-# ── Role → repo folder mapping ───────────────────────────────────────────────
-ROLE_TO_FOLDER = {
-    "front end developer":               "frontend",
-    "back end developer":                "backend",
-    "full stack developer":              "full-stack",
-    "devops engineer":                   "devops",
-    "platform engineer":                 "devops",
-    "cloud engineer":                    "aws",
-    "cloud solutions architect":         "aws",
-    "software engineer":                 "backend",
-    "data analyst":                      "data-analyst",
-    "business intelligence analyst":     "bi-analyst",
-    "data scientist":                    "ai-data-scientist",
-    "machine learning engineer":         "machine-learning",
-    "mlops engineer":                    "mlops",
-    "artificial intelligence engineer":  "ai-engineer",
-    "cybersecurity analyst":             "cyber-security",
-    "network security engineer":         "cyber-security",
-    "ux designer":                       "ux-design",
-    "game developer":                    "game-developer",
-    "product manager":                   "product-manager",
-}
+# ── Metrics ─────────────────────────────────────────────────────────────────
+# Stages of one roadmap build (cache misses only): parse_json -> load_md
+# (all nodes, summed) -> build_nodes (excluding load_md) -> build_edges.
+# Every request then pays overlay (known flags on the cached roadmap).
+metrics = Registry()
+STAGE_SECONDS = metrics.histogram(
+    "roadmap_extract_stage_seconds", "Time spent in each roadmap extraction stage", ["stage"]
+)
+EXTRACT_SECONDS = metrics.histogram(
+    "roadmap_extract_seconds", "Total roadmap extraction time per request"
+)
+REQUEST_SECONDS = metrics.histogram(
+    "roadmap_request_seconds", "HTTP request latency", ["endpoint", "status"]
+)
+CACHE_LOOKUPS = metrics.counter(
+    "roadmap_cache_lookups_total", "Roadmap cache lookups (hit, miss, stale)", ["result"]
+)
+RELOADS = metrics.counter(
+    "roadmap_reloads_total", "Background roadmap rebuilds after checkout changes",
+    ["result"]
+)
+RELOAD_SECONDS = metrics.histogram(
+    "roadmap_reload_seconds", "Duration of one background roadmap rebuild"
+)
+RESPONSE_BYTES = metrics.histogram(
+    "roadmap_response_bytes", "Response body size as sent", ["endpoint", "encoding"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+)
 
 SKIP_TYPES = {
     "group","label","section","column","title",
@@ -59,10 +106,6 @@ SKIP_PHRASES = [
 
 # ── Core extraction logic ────────────────────────────────────────────────────
 
-def resolve_folder(role: str) -> str:
-    return ROLE_TO_FOLDER.get(role.strip().lower(), role.strip().lower())
-
-
 def get_label(node):
     d = node.get("data", {})
     raw = d.get("label", d.get("title", d.get("text", "")))
@@ -74,33 +117,36 @@ def is_annotation(label):
     return any(p in low for p in SKIP_PHRASES)
 
 
-def load_md(cdir, node_id):
-    if not cdir.exists():
-        return ""
-    clean = node_id.rstrip("-")
-    for f in cdir.glob("*.md"):
-        part = f.stem.split("@")[-1] if "@" in f.stem else ""
-        if part in (clean, node_id):
-            return f.read_text(encoding="utf-8")
-    return ""
+def roadmap_paths(folder: str) -> tuple[Path, Path]:
+    root = Path(REPO_PATH) / "src/data/roadmaps" / folder
+    return root / f"{folder}.json", root / "content"
 
 
-def extract(role_input: str, known_skills: list[str]) -> dict:
-    folder   = resolve_folder(role_input)
-    repo     = Path(REPO_PATH)
-    json_path = repo / "src/data/roadmaps" / folder / f"{folder}.json"
+def roadmap_signature(json_path: Path, cdir: Path) -> tuple:
+    """
+    Changes whenever the roadmap JSON is modified or a content file is
+    added, removed or replaced (checkouts and atomic saves touch the
+    directory mtime)
+    """
+    st = json_path.stat()
+    content = cdir.stat().st_mtime_ns if cdir.exists() else None
+    return (st.st_mtime_ns, st.st_size, content)
 
-    if not json_path.exists():
-        raise FileNotFoundError(
-            f"Roadmap not found for role '{role_input}' (folder: '{folder}'). "
-            f"Expected: {json_path}"
-        )
 
+def build_roadmap(folder: str, json_path: Path, cdir: Path, signature: tuple) -> dict:
+    """
+    Query-independent part of a roadmap: filtered nodes (with markdown
+    content) and edges. Cached per folder; never mutate the result.
+    """
+    built_at = time.time_ns()   # before any file is read, see RoadmapCache.put
+    t0    = time.perf_counter()
     data  = json.loads(json_path.read_text(encoding="utf-8"))
     nodes = data.get("nodes", [])
     edges = data.get("edges", [])
-    cdir  = repo / "src/data/roadmaps" / folder / "content"
-    known_lower = {s.lower().strip() for s in known_skills}
+    t_nodes = time.perf_counter()
+    STAGE_SECONDS.observe(t_nodes - t0, stage="parse_json")
+    contents = content_index(cdir)
+    md_seconds = 0.0
 
     # Connected node IDs
     connected_ids = set()
@@ -133,6 +179,10 @@ def extract(role_input: str, known_skills: list[str]) -> dict:
         except:
             w, h = 200, 40
 
+        t_md = time.perf_counter()
+        content = contents.load(n["id"])
+        md_seconds += time.perf_counter() - t_md
+
         out_nodes.append({
             "id":      n["id"],
             "label":   label,
@@ -141,11 +191,13 @@ def extract(role_input: str, known_skills: list[str]) -> dict:
             "y":       float(pos.get("y", 0)),
             "w":       w,
             "h":       h,
-            "content": load_md(cdir, n["id"]),
-            "known":   label.lower() in known_lower,
-            "skipped": label.lower() in known_lower,   # alias for viewer
+            "content": content,
         })
 
+    t_edges = time.perf_counter()
+    STAGE_SECONDS.observe(md_seconds, stage="load_md")
+    STAGE_SECONDS.observe(t_edges - t_nodes - md_seconds, stage="build_nodes")
+
     node_ids = {n["id"] for n in out_nodes}
     out_edges = []
     for e in edges:
@@ -164,24 +216,359 @@ def extract(role_input: str, known_skills: list[str]) -> dict:
             ),
         })
 
+    STAGE_SECONDS.observe(time.perf_counter() - t_edges, stage="build_edges")
+
+    json_mtime, _, content_mtime = signature
+    return finish_roadmap(
+        {"folder": folder, "nodes": out_nodes, "edges": out_edges},
+        version=f"{folder}:{signature}:{built_at}",
+        modified=max(json_mtime, content_mtime or 0) / 1e9,
+        built_at=built_at,
+    )
+
+
+def finish_roadmap(roadmap: dict, version: str, modified: float, built_at: int = 0) -> dict:
+    """
+    Adds what requests need on top of nodes/edges: lowercased labels for
+    the known overlay, content-free nodes for slim responses, markdown by
+    node ID, and the version / modification time behind ETag and
+    Last-Modified.
+    """
+    nodes = roadmap["nodes"]
+    roadmap["label_lowers"] = [n["label"].lower() for n in nodes]
+    roadmap["slim_nodes"] = [
+        {**{k: v for k, v in n.items() if k != "content"},
+         "content_length": len(n["content"].strip())}
+        for n in nodes
+    ]
+    roadmap["content_by_id"] = {n["id"]: n["content"] for n in nodes}
+    roadmap["version"] = version
+    roadmap["modified"] = modified
+    roadmap["built_at"] = built_at
+    return roadmap
+
+
+class RoadmapCache:
+    """
+    Bounded LRU of build_roadmap() results per folder, each stored with the
+    signature of the files it was built from and rebuilt when that changes.
+
+    With validate off (a watcher is running), hits are served without
+    checking the signature; the watcher rebuilds changed roadmaps and swaps
+    them in with put().
+    """
+
+    def __init__(self, max_size, validate=True):
+        self.max_size = max_size
+        self.validate = validate
+        self.entries = OrderedDict()   # folder -> (signature, roadmap)
+        self.changed_at = {}           # folder -> time.time_ns() of last reported change
+        self.lock = threading.Lock()
+
+    def get(self, folder: str, json_path: Path, cdir: Path) -> dict:
+        signature = roadmap_signature(json_path, cdir) if self.validate else None
+
+        with self.lock:
+            entry = self.entries.get(folder)
+            if entry is not None and (signature is None or entry[0] == signature):
+                self.entries.move_to_end(folder)
+                CACHE_LOOKUPS.inc(result="hit")
+                return entry[1]
+        CACHE_LOOKUPS.inc(result="miss" if entry is None else "stale")
+
+        # Built outside the lock: a slow roadmap does not block cache hits
+        if signature is None:
+            signature = roadmap_signature(json_path, cdir)
+        roadmap = build_roadmap(folder, json_path, cdir, signature)
+        self.put(folder, signature, roadmap)
+        return roadmap
+
+    def put(self, folder: str, signature: tuple, roadmap: dict):
+        """
+        Swap in a roadmap, unless it was built before the folder last
+        changed or is older than the cached one (slow concurrent builds)
+        """
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            if roadmap["built_at"] < self.changed_at.get(folder, 0):
+                return
+            entry = self.entries.get(folder)
+            if entry is not None and entry[1]["built_at"] > roadmap["built_at"]:
+                return
+            self.entries[folder] = (signature, roadmap)
+            self.entries.move_to_end(folder)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def mark_changed(self, folders) -> list[str]:
+        """Record a change to folders (None = all); returns the cached ones."""
+        now = time.time_ns()
+        with self.lock:
+            if folders is None:
+                folders = list(self.entries)
+            for folder in folders:
+                self.changed_at[folder] = now
+            return [f for f in folders if f in self.entries]
+
+    def discard(self, folder: str):
+        with self.lock:
+            self.entries.pop(folder, None)
+
+    def build_times(self) -> dict:
+        with self.lock:
+            return {f: roadmap["built_at"] for f, (_, roadmap) in self.entries.items()}
+
+
+roadmap_cache = RoadmapCache(ROADMAP_CACHE_SIZE)
+
+
+def load_prebuilt(store_dir: str) -> dict:
+    """All roadmaps of a prebuilt store, in the form build_roadmap() returns."""
+    manifest, roadmaps = load_store(store_dir)
+    modified = (Path(store_dir) / MANIFEST_FILE).stat().st_mtime
+    for folder, roadmap in roadmaps.items():
+        finish_roadmap(roadmap, f"{folder}:{manifest['built_at']}", modified)
+
+    missing = sorted(set(ROLE_TO_FOLDER.values()) - roadmaps.keys())
+    if missing:
+        raise ValueError(
+            f"Roadmap store {store_dir} lacks mapped folders: {', '.join(missing)}. "
+            f"Rebuild it with: python parse_roadmap.py --all --store {store_dir}"
+        )
+    print(f"  Loaded {len(roadmaps)} prebuilt roadmaps from {store_dir} "
+          f"(built {manifest['built_at']})")
+    return roadmaps
+
+
+# Loaded once at startup, so no request ever touches the checkout
+prebuilt_roadmaps = load_prebuilt(ROADMAP_STORE) if ROADMAP_STORE else None
+
+
+def reload_roadmaps(folders):
+    """
+    Watcher callback: rebuild the cached roadmaps among the changed folders
+    (None = all) and swap them in. Requests keep getting the previous
+    version until the new one is ready; uncached folders are built on
+    their next request as usual.
+    """
+    for folder in roadmap_cache.mark_changed(folders):
+        t0 = time.perf_counter()
+        json_path, cdir = roadmap_paths(folder)
+        drop_content_index(cdir)   # markdown may have been edited in place
+
+        if not json_path.exists():
+            roadmap_cache.discard(folder)
+            RELOADS.inc(result="removed")
+            print(f"  Roadmap '{folder}' removed from the checkout, dropped from cache")
+            continue
+
+        try:
+            signature = roadmap_signature(json_path, cdir)
+            roadmap = build_roadmap(folder, json_path, cdir, signature)
+        except Exception as e:
+            # Keep serving the previous version (e.g. checkout mid-update);
+            # the next change to the folder retries
+            RELOADS.inc(result="failed")
+            print(f"  Reloading roadmap '{folder}' failed: {e!r}")
+            continue
+
+        # In-place markdown edits leave the file signature as it was
+        roadmap["modified"] = max(roadmap["modified"], time.time())
+        roadmap_cache.put(folder, signature, roadmap)
+        seconds = time.perf_counter() - t0
+        RELOADS.inc(result="ok")
+        RELOAD_SECONDS.observe(seconds)
+        print(f"  Reloaded roadmap '{folder}' in {seconds * 1000:.0f} ms "
+              f"({len(roadmap['nodes'])} nodes, {len(roadmap['edges'])} edges)")
+
+
+watcher = None            # see start_watcher()
+watcher_checked = False
+watcher_lock = threading.Lock()
+
+
+def start_watcher():
+    """
+    Start watching the checkout, once per process. Returns the watcher, or
+    None when serving a prebuilt store, disabled or there is no checkout.
+
+    Not done at import: under app.run(debug=True) the reloader's parent
+    process imports this module too, but never serves.
+    """
+    global watcher, watcher_checked
+    with watcher_lock:
+        if watcher_checked:
+            return watcher
+        watcher_checked = True
+
+        root = Path(REPO_PATH) / "src/data/roadmaps"
+        if prebuilt_roadmaps is not None or ROADMAP_WATCH == "off" or ROADMAP_CACHE_SIZE <= 0:
+            return None
+        if not root.is_dir():
+            print(f"  Not watching {root}: no such directory")
+            return None
+
+        watcher = RoadmapWatcher(
+            root, reload_roadmaps, roadmap_cache.build_times, mode=ROADMAP_WATCH,
+            interval=ROADMAP_WATCH_INTERVAL, debounce=ROADMAP_WATCH_DEBOUNCE,
+        ).start()
+        roadmap_cache.validate = False
+        print(f"  Watching {root} for roadmap changes ({watcher.mode})")
+        return watcher
+
+
+def overlay_known(roadmap: dict, role_input: str, known_lower: set[str], slim: bool = False) -> dict:
+    """
+    Per-request response: the cached roadmap plus the user's known flags.
+    Nodes are shallow copies, so the cached ones stay untouched. Slim
+    responses carry content_length instead of the markdown itself.
+    """
+    nodes = []
+    source = roadmap["slim_nodes"] if slim else roadmap["nodes"]
+    for node, label_lower in zip(source, roadmap["label_lowers"]):
+        known = label_lower in known_lower
+        nodes.append({**node, "known": known, "skipped": known})   # skipped: alias for viewer
+
     return {
         "role":   role_input,
-        "folder": folder,
-        "nodes":  out_nodes,
-        "edges":  out_edges,
+        "folder": roadmap["folder"],
+        "nodes":  nodes,
+        "edges":  roadmap["edges"],
         "known":  list(known_lower),
     }
 
 
+def get_roadmap(role_input: str) -> dict:
+    """Cached (or prebuilt) roadmap of a role; FileNotFoundError if none."""
+    folder = resolve_folder(role_input)
+
+    if prebuilt_roadmaps is not None:
+        roadmap = prebuilt_roadmaps.get(folder)
+        if roadmap is None:
+            raise FileNotFoundError(
+                f"Roadmap not found for role '{role_input}' (folder: '{folder}') "
+                f"in the prebuilt store {ROADMAP_STORE}"
+            )
+        return roadmap
+
+    json_path, cdir = roadmap_paths(folder)
+
+    if not json_path.exists():
+        raise FileNotFoundError(
+            f"Roadmap not found for role '{role_input}' (folder: '{folder}'). "
+            f"Expected: {json_path}"
+        )
+
+    return roadmap_cache.get(folder, json_path, cdir)
+
+
+# ── HTTP caching / compression ───────────────────────────────────────────────
+
+def make_etag(roadmap: dict, *variant) -> str:
+    """Changes with the roadmap version and whatever shapes the response."""
+    key = "\x00".join(map(str, (roadmap["version"], *variant)))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+def set_validators(response, etag: str, modified: float):
+    # Weak: gzip and the order of "known" may change the bytes, not the meaning
+    response.set_etag(etag, weak=True)
+    response.last_modified = modified
+    response.cache_control.no_cache = True   # always revalidate, usually 304
+    return response
+
+
+def not_modified(etag: str, modified: float):
+    """304 response if the client's copy is still current, else None."""
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since:
+        fresh = int(modified) <= request.if_modified_since.timestamp()
+    else:
+        return None
+    if not fresh:
+        return None
+    return set_validators(Response(status=304), etag, modified)
+
+
+def is_truthy(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes")
+
+
 # ── API Routes ───────────────────────────────────────────────────────────────
 
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.before_request
+def ensure_watcher():
+    # flask run / WSGI servers import the app without running __main__
+    if not watcher_checked:
+        start_watcher()
+
+
+@app.after_request
+def compress(response):
+    """gzip JSON / text / HTML bodies for clients that accept it."""
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    compressible = response.mimetype in (
+        "application/json", "text/html", "text/plain", "text/css", "application/javascript"
+    )
+    if compressible:
+        response.vary.add("Accept-Encoding")
+    if (
+        not compressible
+        or response.status_code != 200
+        or "Content-Encoding" in response.headers
+        or request.accept_encodings["gzip"] <= 0
+    ):
+        if response.content_length is not None:
+            RESPONSE_BYTES.observe(response.content_length, endpoint=endpoint, encoding="identity")
+        return response
+
+    response.direct_passthrough = False   # static files (viewer) too
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        RESPONSE_BYTES.observe(len(data), endpoint=endpoint, encoding="identity")
+        return response
+
+    response.set_data(gzip.compress(data, GZIP_LEVEL))
+    response.headers["Content-Encoding"] = "gzip"
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)   # different bytes than the identity file
+    RESPONSE_BYTES.observe(response.content_length, endpoint=endpoint, encoding="gzip")
+    return response
+
+
+@app.after_request
+def record_latency(response):
+    # Route pattern, not the raw path, so labels stay bounded
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - g.request_start, endpoint=endpoint, status=response.status_code
+    )
+    return response
+
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Prometheus text format: extraction stage timings and request latency."""
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+
 @app.route("/api/roadmap")
 def api_roadmap():
     """
-    GET /api/roadmap?role=Front+End+Developer&known=HTML,CSS,JavaScript
+    GET /api/roadmap?role=Front+End+Developer&known=HTML,CSS,JavaScript[&slim=1]
 
     Returns roadmap JSON directly — call this from your quiz component
     to get data, or redirect user to /viewer for the visual roadmap.
+    With slim=1 nodes carry content_length instead of their markdown;
+    fetch it from /api/roadmap/content when needed.
     """
     role = request.args.get("role", "").strip()
     if not role:
@@ -189,15 +576,66 @@ def api_roadmap():
 
     known_raw = request.args.get("known", "")
     known = [s.strip() for s in known_raw.split(",") if s.strip()] if known_raw else []
+    slim = is_truthy(request.args.get("slim", ""))
+
+    try:
+        # Lookup, then the known overlay unless the client's copy is current
+        with EXTRACT_SECONDS.time():
+            roadmap = get_roadmap(role)
+            known_lower = {s.lower().strip() for s in known}
+            etag = make_etag(roadmap, "roadmap", role, slim, *sorted(known_lower))
+            cached = not_modified(etag, roadmap["modified"])
+            if cached is not None:
+                return cached
+            with STAGE_SECONDS.time(stage="overlay"):
+                result = overlay_known(roadmap, role, known_lower, slim)
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": f"Extraction failed: {e}"}), 500
+
+    return set_validators(jsonify(result), etag, roadmap["modified"])
+
+
+@app.route("/api/roadmap/content")
+def api_roadmap_content():
+    """
+    GET /api/roadmap/content?role=Front+End+Developer&ids=<id>,<id>
+    (or repeated &id=<id>)
+
+    Markdown of the requested nodes: {"folder", "content": {id: markdown},
+    "missing": [ids not in the roadmap]}.
+    """
+    role = request.args.get("role", "").strip()
+    if not role:
+        return jsonify({"error": "Missing 'role' parameter"}), 400
+
+    ids = request.args.getlist("id")
+    for raw in request.args.getlist("ids"):
+        ids.extend(s.strip() for s in raw.split(",") if s.strip())
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return jsonify({"error": "Missing 'id' or 'ids' parameter"}), 400
 
     try:
-        result = extract(role, known)
+        roadmap = get_roadmap(role)
     except FileNotFoundError as e:
         return jsonify({"error": str(e)}), 404
     except Exception as e:
         return jsonify({"error": f"Extraction failed: {e}"}), 500
 
-    return jsonify(result)
+    etag = make_etag(roadmap, "content", *ids)
+    cached = not_modified(etag, roadmap["modified"])
+    if cached is not None:
+        return cached
+
+    by_id = roadmap["content_by_id"]
+    result = {
+        "folder":  roadmap["folder"],
+        "content": {i: by_id[i] for i in ids if i in by_id},
+        "missing": [i for i in ids if i not in by_id],
+    }
+    return set_validators(jsonify(result), etag, roadmap["modified"])
 
 
 @app.route("/viewer")
@@ -226,4 +664,9 @@ if __name__ == "__main__":
     print(f"\n  Roadmap API running at http://localhost:{PORT}")
     print(f"  Example: http://localhost:{PORT}/viewer?role=Front+End+Developer&known=HTML,CSS\n")
 
-  app.run(port=PORT, debug=True)
+    # debug=True runs the app in a reloader child (WERKZEUG_RUN_MAIN=true);
+    # the parent only restarts it on source changes and must not watch
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_watcher()
+
+    app.run(port=PORT, debug=True)
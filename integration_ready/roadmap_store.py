@@ -0,0 +1,75 @@
+"""
+roadmap_store.py — prebuilt roadmaps, so roadmap_server.py can run without
+the developer-roadmap checkout.
+
+Written by: python parse_roadmap.py --all --store roadmap_store
+Served by:  ROADMAP_STORE=roadmap_store python roadmap_server.py
+
+  roadmap_store/
+    manifest.json        <- format, source repo, build time, per-folder counts
+    frontend.json        <- {"folder", "nodes", "edges"} (markdown inlined)
+    backend.json ...
+
+Roadmaps are stored query-independent: the per-request known/skipped flags
+are added by the server.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+STORE_FORMAT  = 1
+MANIFEST_FILE = "manifest.json"
+
+
+def write_json(path: Path, data):
+    """Compact JSON, written to a temp file and renamed into place."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(
+        json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8"
+    )
+    os.replace(tmp, path)
+
+
+def write_roadmap(store_dir: Path, roadmap: dict) -> dict:
+    """Store one roadmap; returns its manifest entry."""
+    path = Path(store_dir) / f"{roadmap['folder']}.json"
+    write_json(path, roadmap)
+    return {
+        "file":  path.name,
+        "nodes": len(roadmap["nodes"]),
+        "edges": len(roadmap["edges"]),
+        "bytes": path.stat().st_size,
+    }
+
+
+def write_manifest(store_dir: Path, entries: dict, source: str):
+    """Written last, so a store is only visible once every roadmap is in."""
+    write_json(Path(store_dir) / MANIFEST_FILE, {
+        "format":    STORE_FORMAT,
+        "source":    source,
+        "built_at":  time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "roadmaps":  dict(sorted(entries.items())),
+    })
+
+
+def load_store(store_dir: Path) -> tuple[dict, dict]:
+    """(manifest, {folder: roadmap}) of a prebuilt store."""
+    store_dir = Path(store_dir)
+    manifest_path = store_dir / MANIFEST_FILE
+    if not manifest_path.exists():
+        raise FileNotFoundError(
+            f"No roadmap store at {store_dir} (missing {MANIFEST_FILE}). "
+            f"Build it with: python parse_roadmap.py --all --store {store_dir}"
+        )
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("format") != STORE_FORMAT:
+        raise ValueError(
+            f"{manifest_path} has format {manifest.get('format')}, expected {STORE_FORMAT}"
+        )
+
+    roadmaps = {}
+    for folder, entry in manifest["roadmaps"].items():
+        roadmaps[folder] = json.loads((store_dir / entry["file"]).read_text(encoding="utf-8"))
+    return manifest, roadmaps
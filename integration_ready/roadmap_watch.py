@@ -0,0 +1,227 @@
+"""
+roadmap_watch.py — reports which roadmap folders of a developer-roadmap
+checkout changed, so roadmap_server.py can rebuild just those.
+
+Watches src/data/roadmaps/, every <folder>/ and every <folder>/content/:
+  inotify  Linux, through libc (no extra dependency)
+  poll     elsewhere, or if inotify is unavailable: every interval, checks
+           the tracked folders for files newer than their last build
+
+Changes are debounced (a git pull touches many files at once) and handed to
+on_change(folders) on the watcher thread; folders=None means "everything"
+(inotify queue overflow).
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+# <sys/inotify.h>
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ISDIR       = 0x40000000
+IN_NONBLOCK    = 0o4000
+IN_CLOEXEC     = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+ADDED      = IN_CREATE | IN_MOVED_TO
+EVENT      = struct.Struct("iIII")   # wd, mask, cookie, len (+ name)
+
+# Poll mode compares mtimes with the build start; some filesystems store
+# mtimes with up to 2 s granularity
+MTIME_SLACK_NS = 2_000_000_000
+
+
+def load_libc_inotify():
+    """libc with the inotify calls, or None where they do not exist."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+def parse_events(buf: bytes):
+    """(wd, mask, name) of each inotify event in a read() buffer."""
+    offset = 0
+    while offset + EVENT.size <= len(buf):
+        wd, mask, _, length = EVENT.unpack_from(buf, offset)
+        offset += EVENT.size
+        name = buf[offset:offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+        offset += length
+        yield wd, mask, name
+
+
+class RoadmapWatcher:
+    def __init__(self, root, on_change, tracked, mode="auto", interval=2.0, debounce=0.5):
+        """
+        root:      src/data/roadmaps of the checkout
+        on_change: called with the set of changed folder names (or None)
+        tracked:   () -> {folder: build start in time.time_ns()} of the
+                   roadmaps worth checking in poll mode
+        mode:      "auto" (inotify, else poll), "inotify" or "poll"
+        """
+        self.root      = Path(root)
+        self.on_change = on_change
+        self.tracked   = tracked
+        self.mode      = mode
+        self.interval  = interval
+        self.debounce  = debounce
+        self.stopped   = threading.Event()
+        self.thread    = None
+        self.libc      = None
+        self.fd        = -1
+        self.watches   = {}   # wd -> (folder, "root" | "folder" | "content")
+        self.reported  = {}   # poll: folder -> newest mtime already reported
+
+    def start(self):
+        if self.mode in ("auto", "inotify"):
+            self.libc = load_libc_inotify()
+            if self.libc is not None:
+                try:
+                    self.init_inotify()
+                except OSError as e:
+                    print(f"  inotify unavailable ({e}), polling instead")
+                    self.libc = None
+            elif self.mode == "inotify":
+                print("  inotify unavailable on this platform, polling instead")
+        self.mode = "inotify" if self.libc is not None else "poll"
+
+        target = self.run_inotify if self.mode == "inotify" else self.run_poll
+        self.thread = threading.Thread(target=target, name="roadmap-watch", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def fire(self, folders):
+        try:
+            self.on_change(folders)
+        except Exception as e:
+            # Never let a failed reload kill the watcher
+            print(f"  Roadmap reload failed: {e!r}")
+
+    # ── inotify ─────────────────────────────────────────────────────────────
+
+    def init_inotify(self):
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.add_watch(self.root, None, "root")
+        for entry in os.scandir(self.root):
+            if entry.is_dir():
+                self.watch_folder(entry.name)
+
+    def add_watch(self, path: Path, folder, kind):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if kind == "root":
+                raise OSError(err, os.strerror(err), str(path))
+            return   # removed again before we got to it
+        self.watches[wd] = (folder, kind)
+
+    def watch_folder(self, folder):
+        self.add_watch(self.root / folder, folder, "folder")
+        if (self.root / folder / "content").is_dir():
+            self.add_watch(self.root / folder / "content", folder, "content")
+
+    def changed_folder(self, wd, mask, name):
+        """Folder an event affects, or None if it does not matter."""
+        folder, kind = self.watches.get(wd, (None, None))
+        if mask & IN_IGNORED:
+            self.watches.pop(wd, None)   # watched directory is gone
+            return None
+        if kind == "root":
+            if not mask & IN_ISDIR:
+                return None
+            if mask & ADDED:
+                self.watch_folder(name)
+            return name
+        if kind == "folder":
+            if name == "content" and mask & ADDED:
+                self.add_watch(self.root / folder / "content", folder, "content")
+            return folder if name in (f"{folder}.json", "content") else None
+        if kind == "content":
+            return folder if name.endswith(".md") else None
+        return None
+
+    def run_inotify(self):
+        pending, first, last = set(), None, None
+        try:
+            while not self.stopped.is_set():
+                timeout = 1.0 if last is None else self.debounce
+                ready, _, _ = select.select([self.fd], [], [], timeout)
+                if ready:
+                    try:
+                        buf = os.read(self.fd, 64 * 1024)
+                    except BlockingIOError:
+                        buf = b""
+                    for wd, mask, name in parse_events(buf):
+                        if mask & IN_Q_OVERFLOW:
+                            pending.add(None)
+                        else:
+                            folder = self.changed_folder(wd, mask, name)
+                            if folder is None:
+                                continue
+                            pending.add(folder)
+                        last = time.monotonic()
+                        first = first or last
+
+                # Fire once things go quiet, or after 10x debounce at most
+                now = time.monotonic()
+                if pending and (now - last >= self.debounce or now - first >= 10 * self.debounce):
+                    self.fire(None if None in pending else pending)
+                    pending, first, last = set(), None, None
+        finally:
+            os.close(self.fd)
+
+    # ── polling ─────────────────────────────────────────────────────────────
+
+    def newest_mtime(self, folder):
+        """Latest mtime of a folder's JSON and content, None if the JSON is gone."""
+        base = self.root / folder
+        try:
+            newest = (base / f"{folder}.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cdir = base / "content"
+        if cdir.is_dir():
+            newest = max(newest, cdir.stat().st_mtime_ns)
+            for entry in os.scandir(cdir):
+                newest = max(newest, entry.stat().st_mtime_ns)
+        return newest
+
+    def run_poll(self):
+        while not self.stopped.wait(self.interval):
+            changed = set()
+            for folder, built_at in self.tracked().items():
+                newest = self.newest_mtime(folder)
+                if newest is None:
+                    changed.add(folder)
+                # Within the slack of the build, but not reported yet
+                elif newest > built_at - MTIME_SLACK_NS and newest != self.reported.get(folder):
+                    self.reported[folder] = newest
+                    changed.add(folder)
+            if changed:
+                self.fire(changed)